@@ -0,0 +1,262 @@
+#Benchmarks for mini_ecdsa. Each benchmark times one operation repeatedly on each curve in a
+#ladder of sizes, and reports ops/sec along with percentiles of the time per operation. Results
+#can be written as JSON and compared against an earlier run, e.g. one made on another commit.
+#
+#   python bench_mini_ecdsa.py
+#   python bench_mini_ecdsa.py --ops mult,sign,verify --curves p32,secp256k1 --json new.json
+#   python bench_mini_ecdsa.py --compare old.json
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from random import Random
+from time import perf_counter, strftime, gmtime
+
+import mini_ecdsa as ecdsa
+
+#The curve ladder. Each entry is (name, p, c, x, y, n) for the curve y^2 = x^3 + c over F_p with
+#the point P = (x,y) generating the whole group of prime order n. The small curves were found by
+#searching down from 2^bits for a prime p and a c giving a curve with a prime number of points,
+#the rest are the Koblitz curves from SEC 2.
+curves = [
+    ('p16', 65521, 17, 1, 1086, 65353),
+    ('p24', 16777213, 7, 6, 8949508, 16770451),
+    ('p32', 4294966981, 13, 2, 4081880396, 4294939651),
+    ('p40', 1099511626987, 11, 3, 263841980912, 1099509643963),
+    ('p48', 281474976710143, 5, 3, 208469848170238, 281474965731367),
+    ('p64', 18446744073709551163, 2, 2, 16929852090725970766, 18446744066322874501),
+    ('secp160k1', 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFAC73, 7,
+     0x3B4C382CE37AA192A4019E763036F4F5DD4D7EBB, 0x938CF935318FDCED6BC28286531733C3F03C4FEE,
+     0x0100000000000000000001B8FA16DFAB9ACA16B6B3),
+    ('secp192k1', 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFEE37, 3,
+     0xDB4FF10EC057E9AE26B07D0280B7F4341DA5D1B1EAE06C7D,
+     0x9B2F2F6D9C5628A7844163D015BE86344082AA88D95E2F9D,
+     0xFFFFFFFFFFFFFFFFFFFFFFFE26F2FC170F69466A74DEFD8D),
+    ('secp224k1', 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFE56D, 5,
+     0xA1455B334DF099DF30FC28A169A467E9E47075A90F7E650EB6B7A45C,
+     0x7E089FED7FBA344282CAFBD6F7E319F7C0B0BD59E2CA4BDB556D61A5,
+     0x010000000000000000000000000001DCE8D2EC6184CAF0A971769FB1F7),
+    ('secp256k1', 2**256 - 2**32 - 977, 7,
+     55066263022277343669578718895168534326250603453777594175500187360389116729240,
+     32670510020758816978083085130507043184471273380659243275938904335757337482424,
+     ecdsa.secp256k1_order),
+]
+
+#Everything a benchmark needs to know about one curve.
+class Setup(object):
+    def __init__(self, name, p, c, x, y, n, rng):
+        self.name, self.bits = name, p.bit_length()
+        #secp256k1 is set up the way CurveOverFp.secp256k1() sets it up, with its GLV endomorphism.
+        if name == 'secp256k1':
+            self.C = ecdsa.CurveOverFp.secp256k1()
+        else:
+            self.C = ecdsa.CurveOverFp(0, 0, c, p)
+        self.P = ecdsa.Point(x, y)
+        self.n = n
+        self.C.num_points, self.C.num_points_factors = n, {n: 1}
+        self.rng = rng
+        self.key = ecdsa.generate_keypair(self.C, self.P, n)
+
+    def scalar(self):
+        return self.rng.randrange(1, self.n)
+
+    def point(self):
+        return self.C.mult(self.P, self.scalar())
+
+    def message(self):
+        return 'benchmark message %d' % self.rng.getrandbits(64)
+
+#Each benchmark takes a Setup and returns a function and its arguments for one timed call.
+#Preparing the arguments isn't timed. Cracking benchmarks are skipped on curves with more
+#bits than their entry in max_bits.
+def bench_mult(s):
+    return s.C.mult, (s.P, s.scalar())
+
+def bench_add(s):
+    return s.C.add, (s.point(), s.point())
+
+def bench_sign(s):
+    return ecdsa.sign, (s.message(), s.C, s.P, s.n, s.key)
+
+def bench_verify(s):
+    m = s.message()
+    return ecdsa.verify, (m, s.C, s.P, s.n, ecdsa.sign(m, s.C, s.P, s.n, s.key))
+
+def bench_get_points(s):
+    return s.C.get_points, ()
+
+def bench_crack_brute_force(s):
+    return ecdsa.crack_brute_force, (s.C, s.P, s.n, s.point())
+
+def bench_crack_baby_giant(s):
+    return ecdsa.crack_baby_giant, (s.C, s.P, s.n, s.point())
+
+def bench_crack_rho(s):
+    return ecdsa.crack_rho, (s.C, s.P, s.n, s.point(), 4)
+
+def bench_crack_rho_parallel(s):
+    return ecdsa.crack_rho_parallel, (s.C, s.P, s.n, s.point())
+
+def bench_crack_pohlig_hellman(s):
+    return ecdsa.crack_pohlig_hellman, (s.C, s.P, s.n, s.point())
+
+#Sign two messages with the same k, by hand since sign always picks a fresh one.
+def bench_crack_from_ECDSA_repeat_k(s):
+    d, Q = s.key
+    k = s.scalar()
+    r = s.C.mult(s.P, k).x % s.n
+    sigs = []
+    for m in (s.message(), s.message()):
+        z = ecdsa.hash_and_truncate(m, s.n)
+        sigs += [m, (Q, r, ecdsa.mult_inv(k, s.n) * (z + r*d) % s.n)]
+    return ecdsa.crack_from_ECDSA_repeat_k, (s.C, s.P, s.n) + tuple(sigs)
+
+benchmarks = {
+    'mult': bench_mult,
+    'add': bench_add,
+    'sign': bench_sign,
+    'verify': bench_verify,
+    'get_points': bench_get_points,
+    'crack_brute_force': bench_crack_brute_force,
+    'crack_baby_giant': bench_crack_baby_giant,
+    'crack_rho': bench_crack_rho,
+    'crack_rho_parallel': bench_crack_rho_parallel,
+    'crack_pohlig_hellman': bench_crack_pohlig_hellman,
+    'crack_from_ECDSA_repeat_k': bench_crack_from_ECDSA_repeat_k,
+}
+
+#Largest curve, in bits, each slow benchmark is run on by default.
+max_bits = {
+    'get_points': 16,
+    'crack_brute_force': 16,
+    'crack_baby_giant': 32,
+    'crack_rho': 32,
+    'crack_rho_parallel': 32,
+    'crack_pohlig_hellman': 32,
+}
+
+#Benchmarks that take seconds rather than microseconds per call, and are repeated fewer times.
+slow = set(max_bits)
+
+#The value below which the given fraction of the sorted samples fall (nearest rank).
+def percentile(samples, fraction):
+    i = max(0, min(len(samples) - 1, int(round(fraction * len(samples))) - 1))
+    return samples[i]
+
+#Time repeat calls of a benchmark on one curve, after one untimed warm up call.
+def run(bench, s, repeat):
+    f, args = bench(s)
+    f(*args)
+    samples = []
+    for i in range(repeat):
+        f, args = bench(s)
+        start = perf_counter()
+        f(*args)
+        samples.append(perf_counter() - start)
+    samples.sort()
+    total = sum(samples)
+    return {'curve': s.name, 'bits': s.bits, 'count': repeat, 'total': total,
+            'ops_per_sec': repeat / total if total > 0 else None,
+            'mean': total / repeat, 'min': samples[0], 'p50': percentile(samples, 0.5),
+            'p90': percentile(samples, 0.9), 'p99': percentile(samples, 0.99),
+            'max': samples[-1]}
+
+#Describe the code and machine a run was made on.
+def environment():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(),
+            'implementation': platform.python_implementation(), 'machine': platform.machine(),
+            'platform': platform.platform(), 'time': strftime('%Y-%m-%dT%H:%M:%SZ', gmtime())}
+
+#Progress is printed to stderr as each benchmark finishes, leaving stdout free for JSON.
+def show_header(file=sys.stderr):
+    print('%-26s %-10s %12s %12s %12s %12s' % ('op', 'curve', 'ops/sec', 'p50 (ms)',
+                                               'p90 (ms)', 'p99 (ms)'), file=file)
+
+def show(r, file=sys.stderr):
+    print('%-26s %-10s %12.2f %12.4f %12.4f %12.4f' % (r['op'], r['curve'], r['ops_per_sec'],
+          1000*r['p50'], 1000*r['p90'], 1000*r['p99']), file=file)
+    file.flush()
+
+#Print how the median time of each benchmark changed relative to an earlier run.
+def compare(results, old, file=sys.stderr):
+    before = dict(((r['op'], r['curve']), r) for r in old['results'])
+    print('%-26s %-10s %12s %12s %9s' % ('op', 'curve', 'old p50', 'new p50', 'speedup'),
+          file=file)
+    for r in results:
+        o = before.get((r['op'], r['curve']))
+        if o is not None:
+            print('%-26s %-10s %12.4f %12.4f %8.2fx' % (r['op'], r['curve'], 1000*o['p50'],
+                  1000*r['p50'], o['p50'] / r['p50']), file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark mini_ecdsa.')
+    parser.add_argument('--ops', help='comma separated benchmarks to run (default: all)')
+    parser.add_argument('--curves', help='comma separated curves to run on (default: all)')
+    parser.add_argument('--list', action='store_true', help='list benchmarks and curves')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='timed calls per fast benchmark (default: 50)')
+    parser.add_argument('--slow-repeat', type=int, default=3,
+                        help='timed calls per slow benchmark (default: 3)')
+    parser.add_argument('--max-bits', type=int,
+                        help='run slow benchmarks on curves up to this many bits')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for the scalars and messages benchmarked (default: 0)')
+    parser.add_argument('--json', metavar='FILE', help="write results as JSON ('-' for stdout)")
+    parser.add_argument('--compare', metavar='FILE', help='compare with results from FILE')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print('benchmarks: ' + ', '.join(benchmarks))
+        print('curves: ' + ', '.join(c[0] for c in curves))
+        return 0
+    ops = args.ops.split(',') if args.ops else list(benchmarks)
+    names = args.curves.split(',') if args.curves else [c[0] for c in curves]
+    for op in ops:
+        if op not in benchmarks:
+            parser.error('unknown benchmark: ' + op)
+    for name in names:
+        if name not in [c[0] for c in curves]:
+            parser.error('unknown curve: ' + name)
+
+    rng = Random(args.seed)
+    results = []
+    show_header()
+    #Keep mini_ecdsa's own output (keys, signatures, cracked keys) out of the results.
+    ecdsa.set_verbose(False)
+    for entry in curves:
+        if entry[0] not in names:
+            continue
+        s = Setup(*entry, rng=rng)
+        for op in ops:
+            limit = max_bits.get(op) if args.max_bits is None else args.max_bits
+            if op in slow and s.bits > limit:
+                continue
+            repeat = args.slow_repeat if op in slow else args.repeat
+            r = run(benchmarks[op], s, repeat)
+            r['op'] = op
+            results.append(r)
+            show(r)
+
+    report = {'environment': environment(), 'seed': args.seed, 'results': results}
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,534 +1,3139 @@
-#Elliptic curve basics, tools for finding rational points, and ECDSA implementation.
-#Brendan Cordy, 2015
-
-from fractions import Fraction
-from math import ceil, sqrt
-from random import SystemRandom, randrange
-from hashlib import sha256
-from time import time
-
-#Useful constant. The order of the subgroup defined in the secp256k1 standard.
-
-secp256k1_order = 115792089237316195423570985008687907852837564279074904382605163141518161494337
-
-#Affine Point (+Infinity) on an Elliptic Curve ---------------------------------------------------
-
-class Point(object):
-    #Construct a point with two given coordindates.
-    def __init__(self, x, y):
-        self.x, self.y = x, y
-        self.inf = False
-
-    #Construct the point at infinity.
-    @classmethod
-    def atInfinity(cls):
-        P = cls(0, 0)
-        P.inf = True
-        return P
-
-    #The secp256k1 generator.
-    @classmethod
-    def secp256k1(cls):
-        return cls(55066263022277343669578718895168534326250603453777594175500187360389116729240,
-                   32670510020758816978083085130507043184471273380659243275938904335757337482424)
-
-    def __str__(self):
-        if self.inf:
-            return 'Inf'
-        else:
-            return '(' + str(self.x) + ',' + str(self.y) + ')'
-
-    def __eq__(self,other):
-        if self.inf:
-            return other.inf
-        elif other.inf:
-            return self.inf
-        else:
-            return self.x == other.x and self.y == other.y
-
-    def is_infinite(self):
-        return self.inf
-
-#Elliptic Curves over any Field ------------------------------------------------------------------
-
-class Curve(object):
-    #Set attributes of a general Weierstrass cubic y^2 = x^3 + ax^2 + bx + c over any field.
-    def __init__(self, a, b, c, char, exp):
-        self.a, self.b, self.c = a, b, c
-        self.char, self.exp = char, exp
-        print(self)
-
-    def __str__(self):
-        #Cases for 0, 1, -1, and general coefficients in the x^2 term.
-        if self.a == 0:
-            aTerm = ''
-        elif self.a == 1:
-            aTerm = ' + x^2'
-        elif self.a == -1:
-            aTerm = ' - x^2'
-        elif self.a < 0:
-            aTerm = " - " + str(-self.a) + 'x^2'
-        else:
-            aTerm = " + " + str(self.a) + 'x^2'
-        #Cases for 0, 1, -1, and general coefficients in the x term.
-        if self.b == 0:
-            bTerm = ''
-        elif self.b == 1:
-            bTerm = ' + x'
-        elif self.b == -1:
-            bTerm = ' - x'
-        elif self.b < 0:
-            bTerm = " - " + str(-self.b) + 'x'
-        else:
-            bTerm = " + " + str(self.b) + 'x'
-        #Cases for 0, 1, -1, and general coefficients in the constant term.
-        if self.c == 0:
-            cTerm = ''
-        elif self.c < 0:
-            cTerm = " - " + str(-self.c)
-        else:
-            cTerm = " + " + str(self.c)
-        #Write out the nicely formatted Weierstrass equation.
-        self.eq = 'y^2 = x^3' + aTerm + bTerm + cTerm
-        #Print prettily.
-        if self.char == 0:
-            return self.eq + ' over Q'
-        elif self.exp == 1:
-            return self.eq + ' over ' + 'F_' + str(self.char)
-        else:
-            return self.eq + ' over ' + 'F_' + str(self.char) + '^' + str(self.exp)
-
-    #Compute the discriminant.
-    def discriminant(self):
-        a, b, c = self.a, self.b, self.c
-        return -4*a*a*a*c + a*a*b*b + 18*a*b*c - 4*b*b*b - 27*c*c
-
-    #Compute the order of a point on the curve.
-    def order(self, P):
-        Q = P
-        orderP = 1
-        #Add P to Q repeatedly until obtaining the identity (point at infinity).
-        while not Q.is_infinite():
-            Q = self.add(P,Q)
-            orderP += 1
-        return orderP
-
-    #List all multiples of a point on the curve.
-    def generate(self, P):
-        Q = P
-        orbit = [str(Point.atInfinity())]
-        #Repeatedly add P to Q, appending each (pretty printed) result.
-        while not Q.is_infinite():
-            orbit.append(str(Q))
-            Q = self.add(P,Q)
-        return orbit
-
-    #Double a point on the curve.
-    def double(self, P):
-        return self.add(P,P)
-
-    #Add P to itself k times.
-    def mult(self, P, k):
-        if P.is_infinite():
-            return P
-        elif k == 0:
-            return Point.atInfinity()
-        elif k < 0:
-            return self.mult(self.invert(P), -k)
-        else:
-            #Convert k to a bitstring and use peasant multiplication to compute the product quickly.
-            b = bin(k)[2:]
-            return self.repeat_additions(P, b, 1)
-
-    #Add efficiently by repeatedly doubling the given point, and adding the result to a running
-    #total when, after the ith doubling, the ith digit in the bitstring b is a one.
-    def repeat_additions(self, P, b, n):
-        if b == '0':
-            return Point.atInfinity()
-        elif b == '1':
-            return P
-        elif b[-1] == '0':
-            return self.repeat_additions(self.double(P), b[:-1], n+1)
-        elif b[-1] == '1':
-            return self.add(P, self.repeat_additions(self.double(P), b[:-1], n+1))
-
-    #Returns a pretty printed list of points.
-    def show_points(self):
-        return [str(P) for P in self.get_points()]
-
-#Elliptic Curves over Q --------------------------------------------------------------------------
-
-class CurveOverQ(Curve):
-    #Construct a Weierstrass cubic y^2 = x^3 + ax^2 + bx + c over Q.
-    def __init__(self, a, b, c):
-        Curve.__init__(self, a, b, c, 0, 0)
-
-    def contains(self, P):
-        if P.is_infinite():
-            return True
-        else:
-            return P.y*P.y == P.x*P.x*P.x + self.a*P.x*P.x + self.b*P.x + self.c
-
-    def get_points(self):
-        #Start with the point at infinity.
-        points = [Point.atInfinity()]
-        #The only possible y values are divisors of the discriminant.
-        for y in divisors(self.discriminant()):
-            #Each possible y value yields a monic cubic polynomial in x, whose roots
-            #must divide the constant term.
-            const_term = self.c - y*y
-            if const_term != 0:
-                for x in divisors(const_term):
-                    P = Point(x,y)
-                    if 0 == x*x*x + self.a*x*x + self.b*x + const_term and self.has_finite_order(P):
-                        points.append(P)
-            #If the constant term is zero, factor out x and look for rational roots
-            #of the resulting quadratic polynomial. Any such roots must divide b.
-            elif self.b != 0:
-                for x in divisors(self.b):
-                    P = Point(x,y)
-                    if 0 == x*x*x+self.a*x*x+self.b*x+const_term and self.has_finite_order(P):
-                        points.append(P)
-            #If the constant term and b are both zero, factor out x^2 and look for rational
-            #roots of the resulting linear polynomial. Any such roots must divide a.
-            elif self.a != 0:
-                 for x in divisors(self.a):
-                    P = Point(x,y)
-                    if 0 == x*x*x+self.a*x*x+self.b*x+const_term and self.has_finite_order(P):
-                        points.append(P)
-            #If the constant term, b, and a are all zero, we have 0 = x^3 + c - y^2 with
-            #const_term = c - y^2 = 0, so (0,y) is a point on the curve.
-            else:
-                points.append(Point(0,y))
-        #Ensure that there are no duplicates in our list of points.
-        unique_points = []
-        for P in points:
-            addP = True
-            for Q in unique_points:
-                if P == Q:
-                    addP = False
-            if addP:
-                unique_points.append(P)
-        return unique_points
-
-    def invert(self, P):
-        if P.is_infinite():
-            return P
-        else:
-            return Point(P.x, -P.y)
-
-    def add(self, P_1, P_2):
-        #Compute the differences in the coordinates.
-        y_diff = P_2.y - P_1.y
-        x_diff = P_2.x - P_1.x
-        #Cases involving the point at infinity.
-        if P_1.is_infinite():
-            return P_2
-        elif P_2.is_infinite():
-            return P_1
-        #Case for adding an affine point to its inverse.
-        elif x_diff == 0 and y_diff != 0:
-            return Point.atInfinity()
-        #Case for adding an affine point to itself.
-        elif x_diff == 0 and y_diff == 0:
-            #If the point is on the x-axis, there's a vertical tangent there (assuming
-            #the curve in nonsingular) so we obtain the point at infinity.
-            if P_1.y == 0:
-                return Point.atInfinity()
-            #Otherwise the result is an affine point on the curve we can arrive at by
-            #following the tangent line, whose slope is given below.
-            else:
-                ld = Fraction(3*P_1.x*P_1.x + 2*self.a*P_1.x + self.b, 2*P_1.y)
-        #Case for adding two distinct affine points, where we compute the slope of
-        #the secant line through the two points.
-        else:
-            ld = Fraction(y_diff, x_diff)
-        #Use the slope of the tangent line or secant line to compute the result.
-        nu = P_1.y - ld*P_1.x
-        x = ld*ld - self.a  -P_1.x - P_2.x
-        y = -ld*x - nu
-        return Point(x,y)
-
-    #Use the Nagell-Lutz Theorem and Mazur's Theorem to potentially save time.
-    def order(self, P):
-        Q = P
-        orderP = 1
-        #Add P to Q repeatedly until obtaining the point at infinity.
-        while not Q.is_infinite():
-            Q = self.add(P,Q)
-            orderP += 1
-            #If we ever obtain non integer coordinates, the point has infinite order.
-            if Q.x != int(Q.x) or Q.y != int(Q.y):
-                return -1
-            #Moreover, all finite order points have order at most 12.
-            if orderP > 12:
-                return -1
-        return orderP
-
-    def has_finite_order(self, P):
-            return not self.order(P) == -1
-
-    def torsion_group(self):
-        highest_order = 1
-        #Find the rational point with the highest order.
-        for P in self.get_points():
-            if self.order(P) > highest_order:
-                highest_order = self.order(P)
-        #If this point generates the entire torsion group, the torsion group is cyclic.
-        if highest_order == len(self.get_points()):
-            print('Z/' + str(highest_order) + 'Z')
-        #If not, by Mazur's Theorem the torsion group must be a direct product of Z/2Z
-        #with the cyclic group generated by the highest order point.
-        else:
-            print('Z/2Z x ' + 'Z/' + str(highest_order) + 'Z')
-        print(C.show_points())
-
-#Elliptic Curves over Prime Order Fields ---------------------------------------------------------
-
-class CurveOverFp(Curve):
-    #Construct a Weierstrass cubic y^2 = x^3 + ax^2 + bx + c over Fp.
-    def __init__(self, a, b, c, p):
-        Curve.__init__(self, a, b, c, p, 1)
-
-    #The secp256k1 curve.
-    @classmethod
-    def secp256k1(cls):
-        return cls(0, 0, 7, 2**256-2**32-2**9-2**8-2**7-2**6-2**4-1)
-
-    def contains(self, P):
-        if P.is_infinite():
-            return True
-        else:
-            return (P.y*P.y) % self.char == (P.x*P.x*P.x + self.a*P.x*P.x + self.b*P.x + self.c) % self.char
-
-    def get_points(self):
-        #Start with the point at infinity.
-        points = [Point.atInfinity()]
-
-        #Just brute force the rest.
-        for x in range(self.char):
-                for y in range(self.char):
-                    P = Point(x,y)
-                    if (y*y) % self.char == (x*x*x + self.a*x*x + self.b*x + self.c) % self.char:
-                        points.append(P)
-        return points
-
-    def invert(self, P):
-        if P.is_infinite():
-            return P
-        else:
-            return Point(P.x, -P.y % self.char)
-
-    def add(self, P_1, P_2):
-        #Adding points over Fp and can be done in exactly the same way as adding over Q,
-        #but with of the all arithmetic now happening in Fp.
-        y_diff = (P_2.y - P_1.y) % self.char
-        x_diff = (P_2.x - P_1.x) % self.char
-        if P_1.is_infinite():
-            return P_2
-        elif P_2.is_infinite():
-            return P_1
-        elif x_diff == 0 and y_diff != 0:
-            return Point.atInfinity()
-        elif x_diff == 0 and y_diff == 0:
-            if P_1.y == 0:
-                return Point.atInfinity()
-            else:
-                ld = ((3*P_1.x*P_1.x + 2*self.a*P_1.x + self.b) * mult_inv(2*P_1.y, self.char)) % self.char
-        else:
-            ld = (y_diff * mult_inv(x_diff, self.char)) % self.char
-        nu = (P_1.y - ld*P_1.x) % self.char
-        x = (ld*ld - self.a - P_1.x - P_2.x) % self.char
-        y = (-ld*x - nu) % self.char
-        return Point(x,y)
-
-#Elliptic Curves over Prime Power Order Fields ---------------------------------------------------
-
-class CurveOverFq(Curve):
-    #Construct a Weierstrass cubic y^2 = x^3 + ax^2 + bx + c over Fp^n.
-    def __init__(self, a, b, c, p, n, irred_poly):
-        self.irred_poly = irred_poly
-        Curve.__init__(self, a, b, c, p, n)
-
-    #TODO: Implement it!
-
-#Number Theoretic Functions ----------------------------------------------------------------------
-
-def divisors(n):
-    divs = [0]
-    for i in range(1, abs(n) + 1):
-        if n % i == 0:
-            divs.append(i)
-            divs.append(-i)
-    return divs
-
-#Extended Euclidean algorithm.
-def euclid(sml, big):
-    #When the smaller value is zero, it's done, gcd = b = 0*sml + 1*big.
-    if sml == 0:
-        return (big, 0, 1)
-    else:
-        #Repeat with sml and the remainder, big%sml.
-        g, y, x = euclid(big % sml, sml)
-        #Backtrack through the calculation, rewriting the gcd as we go. From the values just
-        #returned above, we have gcd = y*(big%sml) + x*sml, and rewriting big%sml we obtain
-        #gcd = y*(big - (big//sml)*sml) + x*sml = (x - (big//sml)*y)*sml + y*big.
-        return (g, x - (big//sml)*y, y)
-
-#Compute the multiplicative inverse mod n of a with 0 < a < n.
-def mult_inv(a, n):
-    g, x, y = euclid(a, n)
-    #If gcd(a,n) is not one, then a has no multiplicative inverse.
-    if g != 1:
-        raise ValueError('multiplicative inverse does not exist')
-    #If gcd(a,n) = 1, and gcd(a,n) = x*a + y*n, x is the multiplicative inverse of a.
-    else:
-        return x % n
-
-#ECDSA functions ---------------------------------------------------------------------------------
-
-#Use sha256 to hash a message, and return the hash value as an integer.
-def hash(message):
-    return int(sha256(message.encode('utf-8')).hexdigest(), 16)
-
-#Hash the message and return integer whose binary representation is the the L leftmost bits
-#of the hash value, where L is the bit length of n.
-def hash_and_truncate(message, n):
-    h = hash(message)
-    b = bin(h)[2:len(bin(n))]
-    return int(b, 2)
-
-#Generate a keypair using the point P of order n on the given curve. The private key is a
-#positive integer d smaller than n, and the public key is Q = dP.
-def generate_keypair(curve, P, n):
-    sysrand = SystemRandom()
-    d = sysrand.randrange(1, n)
-    Q = curve.mult(P, d)
-    print("Priv key: d = " + str(d))
-    print("Publ key: Q = " + str(Q))
-    return (d, Q)
-
-#Create a digital signature for the string message using a given curve with a distinguished
-#point P which generates a prime order subgroup of size n.
-def sign(message, curve, P, n, keypair):
-    #Extract the private and public keys, and compute z by hashing the message.
-    d, Q = keypair
-    z = hash_and_truncate(message, n)
-    #Choose a randomly selected secret point kP then compute r and s.
-    r, s = 0, 0
-    while r == 0 or s == 0:
-        sysrand = SystemRandom()
-        k = sysrand.randrange(1, n)
-        R = curve.mult(P, k)
-        r = R.x % n
-        s = (mult_inv(k, n) * (z + r*d)) % n
-    print('ECDSA sig: (Q, r, s) = (' + str(Q) + ', ' + str(r) + ', ' + str(s) + ')')
-    return (Q, r, s)
-
-#Verify the string message is authentic, given an ECDSA signature generated using a curve with
-#a distinguished point P that generates a prime order subgroup of size n.
-def verify(message, curve, P, n, sig):
-    Q, r, s = sig
-    #Confirm that Q is on the curve.
-    if Q.is_infinite() or not curve.contains(Q):
-        return False
-    #Confirm that Q has order that divides n.
-    if not curve.mult(Q,n).is_infinite():
-        return False
-    #Confirm that r and s are at least in the acceptable range.
-    if r > n or s > n:
-        return False
-    #Compute z in the same manner used in the signing procedure,
-    #and verify the message is authentic.
-    z = hash_and_truncate(message, n)
-    w = mult_inv(s, n) % n
-    u_1, u_2 = z * w % n, r * w % n
-    C_1, C_2 = curve.mult(P, u_1), curve.mult(Q, u_2)
-    C = curve.add(C_1, C_2)
-    return r % n == C.x % n
-
-#Key Cracking Functions --------------------------------------------------------------------------
-
-#Find d for which Q = dP by simply trying all possibilities
-def crack_brute_force(curve, P, n, Q):
-    start_time = time()
-    for d in range(n):
-        if curve.mult(P,d) == Q:
-            end_time = time()
-            print("Priv key: d = " + str(d))
-            print("Time: " + str(round(end_time - start_time, 3)) + " secs")
-            break
-
-#Find d for which Q = dP using the baby-step giant-step algortihm.
-def crack_baby_giant(curve, P, n, Q):
-    start_time = time()
-    m = int(ceil(sqrt(n)))
-    #Build a hash table with all bP with 0 < b < m using a dictionary. The dicitonary value
-    #stores b so that it can be quickly recovered after a matching giant step hash.
-    baby_table = {}
-    for b in range(m):
-        bP = curve.mult(P,b)
-        baby_table[str(bP)] = b
-    #Check if Q - gmP is in the hash table for all 0 < g < m. If we get such a matching hash,
-    #we have Q - gmP = bP, so extract b from the dictionary, then Q = (b + gm)P.
-    for g in range(m):
-        R = curve.add(Q, curve.invert(curve.mult(P, g*m)))
-        if str(R) in baby_table.keys():
-            b = baby_table[str(R)]
-            end_time = time()
-            print("Priv key: d = " + str((b + g*m) % n))
-            print("Time: " + str(round(end_time - start_time, 3)) + " secs")
-            break
-
-#Find d for which Q = dP using Pollard's rho algorithm. Assumes subgroup has prime order n.
-def crack_rho(curve, P, n, Q, bits):
-    start_time = time()
-    R_list = []
-    #Compute 2^bits randomly selected linear combinations of P and Q, storing them as triples
-    #of the form (aP + bQ, a, b) in R_list.
-    for i in range(2**bits):
-        a, b = randrange(0,n), randrange(0,n)
-        R_list.append((curve.add(curve.mult(P,a), curve.mult(Q,b)), a, b))
-    #Compute a new random linear combination of P and Q to start the cycle-finding.
-    aT, bT = randrange(0,n), randrange(0,n)
-    aH, bH = aT, bT
-    T = curve.add(curve.mult(P,aT), curve.mult(Q,bT))
-    H = curve.add(curve.mult(P,aH), curve.mult(Q,bH))
-    while True:
-        #Advance the tortoise one step, by adding a point in R_list determined by the last b
-        #bits in the binary explansion of the x coordinate of the current position.
-        j = int(bin(T.x)[len(bin(T.x)) - bits : len(bin(T.x))], 2)
-        T, aT, bT = curve.add(T, R_list[j][0]), (aT + R_list[j][1]) % n, (bT + R_list[j][2]) % n
-        #Advance the hare two steps, again by adding points in R_list determined by the last
-        #b bits in the binary explansion of the x coordinate of the current position.
-        for i in range(2):
-            j = int(bin(H.x)[len(bin(H.x)) - bits : len(bin(H.x))], 2)
-            H, aH, bH = curve.add(H, R_list[j][0]), (aH + R_list[j][1]) % n, (bH + R_list[j][2]) % n
-        #If the tortoise and hare arrive at the same point, a cycle has been found.
-        if(T == H):
-            break
-    #It is possible that the tortoise and hare arrive at exactly the same linear combination.
-    if bH == bT:
-        end_time = time()
-        print("Rho failed with identical linear combinations")
-        print(str(end_time - start_time) + " secs")
-    else:
-        end_time = time()
-        print("Priv key: d = " + str((aT - aH) * mult_inv((bH - bT) % n, n) % n))
-        print("Time: " + str(round(end_time - start_time, 3)) + " secs")
-
-#Find d from two messages signed with the same nonce k. Assumes subgroup has prime order n.
-def crack_from_ECDSA_repeat_k(curve, P, n, m1, sig1, m2, sig2):
-    Q1, r1, s1 = sig1
-    Q2, r2, s2 = sig2
-    #Check that the two messages were signed with the same k. This check may pass even if m1
-    #and m2 were signed with distinct k, in which case the value of d computed below will be
-    #wrong, but this is a very unlikely scenario.
-    if not r1 == r2:
-        print("Messages signed with distinct k")
-    else:
-        z1 = hash_and_truncate(m1, n)
-        z2 = hash_and_truncate(m2, n)
-        k = (z1 - z2) * mult_inv((s1 - s2) % n, n) % n
-        d = mult_inv(r1, n) * ((s1 * k) % n - z1) % n
-        print("Priv key: d = " + str(d))
+#Elliptic curve basics, tools for finding rational points, and ECDSA implementation.
+#Brendan Cordy, 2015
+
+from fractions import Fraction
+from math import isqrt, gcd
+from random import SystemRandom, randrange
+from hashlib import sha256
+from time import time, perf_counter
+from copy import copy
+from functools import lru_cache
+from contextlib import contextmanager
+from itertools import islice
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import json
+import dbm
+import builtins
+import os
+import sys
+import threading
+import weakref
+import logging
+
+#NumPy is optional. It's only needed for PointArrays.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#Everything the module prints goes through this logger, at level INFO. Use set_verbose(False) to
+#silence it. Messages propagate to the root logger, so an application's own logging
+#configuration sees them like any others.
+logger = logging.getLogger('mini_ecdsa')
+
+#Write log messages to whatever sys.stdout is at the time, so that printed output behaves the way
+#it always has, including under contextlib.redirect_stdout. The handler stands aside once logging
+#has been configured, with a handler on the root logger or another one on this logger, so that
+#the messages go to those handlers alone instead of being printed twice.
+class StdoutHandler(logging.Handler):
+    def emit(self, record):
+        if logging.getLogger().handlers or len(logger.handlers) > 1:
+            return
+        sys.stdout.write(self.format(record) + '\n')
+
+logger.addHandler(StdoutHandler())
+logger.setLevel(logging.INFO)
+
+#Turn the module's printed output on or off.
+def set_verbose(verbose=True):
+    logger.setLevel(logging.INFO if verbose else logging.WARNING)
+
+#Silence the module's printed output inside a with block.
+@contextmanager
+def quiet():
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+#Useful constant. The order of the subgroup defined in the secp256k1 standard.
+
+secp256k1_order = 115792089237316195423570985008687907852837564279074904382605163141518161494337
+
+#Affine Point (+Infinity) on an Elliptic Curve ---------------------------------------------------
+
+_set = object.__setattr__
+
+class Point(object):
+    #Points are immutable, so they can be shared freely and used as dictionary keys. Slots keep
+    #each one small (no __dict__), and attributes are set through object.__setattr__ since the
+    #class's own __setattr__ refuses.
+    __slots__ = ('x', 'y', 'inf')
+
+    #Construct a point with two given coordindates.
+    def __init__(self, x, y):
+        _set(self, 'x', x)
+        _set(self, 'y', y)
+        _set(self, 'inf', False)
+
+    #Construct the point at infinity.
+    @classmethod
+    def atInfinity(cls):
+        P = cls(0, 0)
+        _set(P, 'inf', True)
+        return P
+
+    #The secp256k1 generator.
+    @classmethod
+    def secp256k1(cls):
+        return cls(55066263022277343669578718895168534326250603453777594175500187360389116729240,
+                   32670510020758816978083085130507043184471273380659243275938904335757337482424)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Point is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Point is immutable')
+
+    #Pickle (and copy) points by constructing them again, which __setattr__ would otherwise block.
+    def __reduce__(self):
+        if self.inf:
+            return (Point.atInfinity, ())
+        else:
+            return (Point, (self.x, self.y))
+
+    def __str__(self):
+        if self.inf:
+            return 'Inf'
+        else:
+            return '(' + str(self.x) + ',' + str(self.y) + ')'
+
+    def __eq__(self,other):
+        if self.inf:
+            return other.inf
+        elif other.inf:
+            return self.inf
+        else:
+            return self.x == other.x and self.y == other.y
+
+    #The module's own hash function shadows the builtin one, so call the builtin explicitly.
+    def __hash__(self):
+        if self.inf:
+            return builtins.hash(None)
+        else:
+            return builtins.hash((self.x, self.y))
+
+    def is_infinite(self):
+        return self.inf
+
+#Elliptic Curves over any Field ------------------------------------------------------------------
+
+class Curve(object):
+    #Width of the non-adjacent form used by mult, at least 2. Wider windows trade a bigger table of
+    #precomputed multiples for fewer additions.
+    window = 4
+
+    #Operation counts, or None if the curve isn't instrumented. See instrument.
+    counts = None
+
+    #A GLV endomorphism used to shorten scalars in multi_mult, or None. See GLV.
+    glv = None
+
+    #Methods wrapped by instrument, and the count each call adds to. Scalar multiplications are
+    #counted by multi_mult, which mult calls. Field multiplications (squarings included, but not
+    #multiplications by small constants like 2 or 3) are charged by the formulas themselves,
+    #whenever they run in full, over finite fields.
+    counted = {'add': 'additions', 'jacobian_add_affine': 'additions',
+               'jacobian_double': 'doublings', 'inverse': 'inversions',
+               'from_jacobian_all': 'inversions', 'multi_mult': 'scalar_mults'}
+
+    #Set attributes of a general Weierstrass cubic y^2 = x^3 + ax^2 + bx + c over any field.
+    def __init__(self, a, b, c, char, exp):
+        self.a, self.b, self.c = a, b, c
+        self.char, self.exp = char, exp
+        logger.info('%s', self)
+
+    def __str__(self):
+        #Cases for 0, 1, -1, and general coefficients in the x^2 term.
+        if self.a == 0:
+            aTerm = ''
+        elif self.a == 1:
+            aTerm = ' + x^2'
+        elif self.a == -1:
+            aTerm = ' - x^2'
+        elif self.a < 0:
+            aTerm = " - " + str(-self.a) + 'x^2'
+        else:
+            aTerm = " + " + str(self.a) + 'x^2'
+        #Cases for 0, 1, -1, and general coefficients in the x term.
+        if self.b == 0:
+            bTerm = ''
+        elif self.b == 1:
+            bTerm = ' + x'
+        elif self.b == -1:
+            bTerm = ' - x'
+        elif self.b < 0:
+            bTerm = " - " + str(-self.b) + 'x'
+        else:
+            bTerm = " + " + str(self.b) + 'x'
+        #Cases for 0, 1, -1, and general coefficients in the constant term.
+        if self.c == 0:
+            cTerm = ''
+        elif self.c < 0:
+            cTerm = " - " + str(-self.c)
+        else:
+            cTerm = " + " + str(self.c)
+        #Write out the nicely formatted Weierstrass equation.
+        self.eq = 'y^2 = x^3' + aTerm + bTerm + cTerm
+        #Print prettily.
+        if self.char == 0:
+            return self.eq + ' over Q'
+        elif self.exp == 1:
+            return self.eq + ' over ' + 'F_' + str(self.char)
+        else:
+            return self.eq + ' over ' + 'F_' + str(self.char) + '^' + str(self.exp)
+
+    #The parameters that determine the curve.
+    def params(self):
+        return (self.a, self.b, self.c, self.char, self.exp)
+
+    #Compute the discriminant.
+    def discriminant(self):
+        a, b, c = self.a, self.b, self.c
+        return -4*a*a*a*c + a*a*b*b + 18*a*b*c - 4*b*b*b - 27*c*c
+
+    #Compute the order of a point on the curve.
+    def order(self, P):
+        Q = P
+        orderP = 1
+        #Add P to Q repeatedly until obtaining the identity (point at infinity).
+        while not Q.is_infinite():
+            Q = self.add(P,Q)
+            orderP += 1
+        return orderP
+
+    #Iterate over the multiples of a point on the curve, starting with the point at infinity.
+    def generate(self, P):
+        multiples = self.progression(Point.atInfinity(), P)
+        yield next(multiples)
+        #Repeatedly add P, until returning to the point at infinity.
+        for Q in multiples:
+            if Q.is_infinite():
+                break
+            yield Q
+
+    #Double a point on the curve.
+    def double(self, P):
+        return self.add(P,P)
+
+    #Add P to itself k times.
+    def mult(self, P, k):
+        return self.multi_mult([(P, k)])
+
+    #Compute k_1P_1 + k_2P_2 + ... + k_mP_m from a list of pairs (P_i, k_i).
+    def multi_mult(self, pairs):
+        lift, lower_all, double, add = self.engine()
+        #Write each k_i in width-w non-adjacent form, whose nonzero digits are odd, smaller than
+        #2^(w-1) in absolute value, and separated by at least w-1 zeros. Negative multiples of P_i
+        #are positive multiples of its inverse.
+        terms = []
+        def add_term(table, k):
+            inverses = [self.invert(T) for T in table]
+            if k < 0:
+                table, inverses, k = inverses, table, -k
+            if k != 0:
+                terms.append((wnaf(k, self.window), table, inverses))
+        for P, k in pairs:
+            if P.is_infinite() or k == 0:
+                continue
+            table = self.odd_multiples(P, 2**(self.window - 2))
+            if self.glv is None:
+                add_term(table, k)
+            else:
+                #Split k into k_1 + k_2*lam with k_1 and k_2 half as long, and compute
+                #k_1P + k_2phi(P). The odd multiples of phi(P) are the images of those of P.
+                k_1, k_2 = self.glv.split(k)
+                add_term(table, k_1)
+                add_term([self.glv.phi(T) for T in table], k_2)
+        #Then it's double and add again, reading digits from the most significant end, but with
+        #the digits of all the scalars interleaved so they share one chain of doublings. Each
+        #nonzero digit costs one addition of a precomputed odd multiple of P_i (or its inverse).
+        R = lift(Point.atInfinity())
+        for i in range(max([len(digits) for digits, table, inverses in terms] + [0]) - 1, -1, -1):
+            R = double(R)
+            for digits, table, inverses in terms:
+                if i < len(digits):
+                    if digits[i] > 0:
+                        R = add(R, table[digits[i] // 2])
+                    elif digits[i] < 0:
+                        R = add(R, inverses[-digits[i] // 2])
+        return lower_all([R])[0]
+
+    #List the affine points P, 3P, 5P, ..., (2*count - 1)P.
+    def odd_multiples(self, P, count):
+        lift, lower_all, double, add = self.engine()
+        twoP = lower_all([double(lift(P))])[0]
+        multiples = [lift(P)]
+        for i in range(count - 1):
+            multiples.append(add(multiples[-1], twoP))
+        return lower_all(multiples)
+
+    #Iterate over the count points R, R + S, R + 2S, ... (forever if count is None), with one
+    #addition per point. Points leave the working coordinates a batch at a time.
+    def progression(self, R, S, count=None, batch=256):
+        lift, lower_all, double, add = self.engine()
+        W = lift(R)
+        while count is None or count > 0:
+            size = batch if count is None else min(batch, count)
+            chunk = [W]
+            for i in range(size - 1):
+                chunk.append(add(chunk[-1], S))
+            W = add(chunk[-1], S)
+            for T in lower_all(chunk):
+                yield T
+            if count is not None:
+                count -= size
+
+    #The functions used for scalar multiplication: one mapping an affine point into the working
+    #coordinates, one mapping a list of points back, and ones doubling a point and adding an affine
+    #point to it in working coordinates. On a general curve, just work with affine points.
+    def engine(self):
+        return (lambda P: P, lambda Rs: Rs, self.double, self.add)
+
+    #Returns a pretty printed list of points.
+    def show_points(self):
+        return [str(P) for P in self.get_points()]
+
+    #Start counting point additions, doublings, field inversions, field multiplications and scalar
+    #multiplications on this curve, in the dictionary self.counts. An affine addition of a point
+    #to itself counts as a doubling, and converting a batch of points out of Jacobian coordinates
+    #as one inversion. If a hook is given, it's called as hook(name, seconds) after each counted
+    #call. Counting works by wrapping methods of this one curve object, so other curves (and this
+    #one, after uninstrument) run at full speed.
+    def instrument(self, hook=None):
+        self.uninstrument()
+        self.counts = dict.fromkeys(sorted(set(self.counted.values()) | {'multiplications'}), 0)
+        for name, key in self.counted.items():
+            if hasattr(self, name):
+                setattr(self, name, self.counting(getattr(self, name), name, key, hook))
+        return self.counts
+
+    def counting(self, f, name, key, hook):
+        counts = self.counts
+        def counted(*args):
+            if hook is not None:
+                start = perf_counter()
+            result = f(*args)
+            if name == 'add' and args[0] == args[1]:
+                counts['doublings'] += 1
+            else:
+                counts[key] += 1
+            if hook is not None:
+                hook(name, perf_counter() - start)
+            return result
+        return counted
+
+    #Stop counting, and return the final counts.
+    def uninstrument(self):
+        for name in self.counted:
+            self.__dict__.pop(name, None)
+        counts, self.counts = self.counts, None
+        return counts
+
+    #Set every count back to zero.
+    def reset_counts(self):
+        for key in self.counts:
+            self.counts[key] = 0
+
+    #Instrumented curves are pickled (to send them to worker processes, say) without their
+    #counting wrappers.
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for name in self.counted:
+            state.pop(name, None)
+        state.pop('counts', None)
+        return state
+
+#Elliptic Curves over Q --------------------------------------------------------------------------
+
+class CurveOverQ(Curve):
+    #Construct a Weierstrass cubic y^2 = x^3 + ax^2 + bx + c over Q.
+    def __init__(self, a, b, c):
+        #Orders of points, filled in as they're computed.
+        self.orders = {}
+        Curve.__init__(self, a, b, c, 0, 0)
+
+    def contains(self, P):
+        if P.is_infinite():
+            return True
+        else:
+            return P.y*P.y == P.x*P.x*P.x + self.a*P.x*P.x + self.b*P.x + self.c
+
+    def get_points(self):
+        #Start with the point at infinity. The points are kept as keys of a dictionary, which
+        #discards duplicates while remembering the order they were found in.
+        points = {Point.atInfinity(): None}
+        #Reduction mod p bounds the number of torsion points, and once that many have been found
+        #there's no need to look any further.
+        bound = self.torsion_bound()
+        if bound == 1:
+            return list(points)
+        #By the Nagell-Lutz theorem, the possible y values are 0 and the y with y^2 dividing the
+        #discriminant.
+        disc = self.discriminant()
+        for y in divisors(disc):
+            if y != 0 and disc % (y*y) != 0:
+                continue
+            #Each possible y value yields a monic cubic polynomial in x, whose roots
+            #must divide the constant term.
+            const_term = self.c - y*y
+            if const_term != 0:
+                xs = divisors(const_term)
+            #If the constant term is zero, factor out x and look for rational roots
+            #of the resulting quadratic polynomial. Any such roots must divide b.
+            elif self.b != 0:
+                xs = divisors(self.b)
+            #If the constant term and b are both zero, factor out x^2 and look for rational
+            #roots of the resulting linear polynomial. Any such roots must divide a.
+            elif self.a != 0:
+                xs = divisors(self.a)
+            #If the constant term, b, and a are all zero, we have 0 = x^3 + c - y^2 with
+            #const_term = c - y^2 = 0, so (0,y) is a point on the curve.
+            else:
+                xs = [0]
+            for x in xs:
+                P = Point(x,y)
+                if 0 == x*x*x + self.a*x*x + self.b*x + const_term and self.has_finite_order(P):
+                    points[P] = None
+            if len(points) == bound:
+                break
+        return list(points)
+
+    #Bound the number of torsion points. For an odd prime p not dividing the discriminant, the
+    #torsion points inject into the points of the curve reduced mod p, so their number divides
+    #p + 1 + the sum of the Legendre symbols (f(x)/p), where f(x) = x^3 + ax^2 + bx + c. Return
+    #the gcd of these numbers for the first few such primes, or 0 for a singular curve.
+    def torsion_bound(self, primes=6):
+        disc = self.discriminant()
+        if disc == 0:
+            return 0
+        bound, p = 0, 3
+        while primes > 0:
+            if disc % p != 0 and is_prime(p):
+                a, b, c = self.a % p, self.b % p, self.c % p
+                bound = gcd(bound, p + 1 + sum(legendre(x*x*x + a*x*x + b*x + c, p) for x in range(p)))
+                primes -= 1
+            p += 2
+        return bound
+
+    def invert(self, P):
+        if P.is_infinite():
+            return P
+        else:
+            return Point(P.x, -P.y)
+
+    def add(self, P_1, P_2):
+        #Compute the differences in the coordinates.
+        y_diff = P_2.y - P_1.y
+        x_diff = P_2.x - P_1.x
+        #Cases involving the point at infinity.
+        if P_1.is_infinite():
+            return P_2
+        elif P_2.is_infinite():
+            return P_1
+        #Case for adding an affine point to its inverse.
+        elif x_diff == 0 and y_diff != 0:
+            return Point.atInfinity()
+        #Case for adding an affine point to itself.
+        elif x_diff == 0 and y_diff == 0:
+            #If the point is on the x-axis, there's a vertical tangent there (assuming
+            #the curve in nonsingular) so we obtain the point at infinity.
+            if P_1.y == 0:
+                return Point.atInfinity()
+            #Otherwise the result is an affine point on the curve we can arrive at by
+            #following the tangent line, whose slope is given below.
+            else:
+                ld = Fraction(3*P_1.x*P_1.x + 2*self.a*P_1.x + self.b, 2*P_1.y)
+        #Case for adding two distinct affine points, where we compute the slope of
+        #the secant line through the two points.
+        else:
+            ld = Fraction(y_diff, x_diff)
+        #Use the slope of the tangent line or secant line to compute the result.
+        nu = P_1.y - ld*P_1.x
+        x = ld*ld - self.a  -P_1.x - P_2.x
+        y = -ld*x - nu
+        return Point(x,y)
+
+    #Use the Nagell-Lutz Theorem and Mazur's Theorem to potentially save time. Orders are
+    #remembered, since finding the torsion points asks for the same ones repeatedly.
+    def order(self, P):
+        if P not in self.orders:
+            self.orders[P] = self.find_order(P)
+        return self.orders[P]
+
+    def find_order(self, P):
+        Q = P
+        orderP = 1
+        #Add P to Q repeatedly until obtaining the point at infinity.
+        while not Q.is_infinite():
+            Q = self.add(P,Q)
+            orderP += 1
+            #If we ever obtain non integer coordinates, the point has infinite order.
+            if Q.x != int(Q.x) or Q.y != int(Q.y):
+                return -1
+            #Moreover, all finite order points have order at most 12.
+            if orderP > 12:
+                return -1
+        return orderP
+
+    def has_finite_order(self, P):
+            return not self.order(P) == -1
+
+    def torsion_group(self):
+        points = self.get_points()
+        #Find the rational point with the highest order.
+        highest_order = max(self.order(P) for P in points)
+        #If this point generates the entire torsion group, the torsion group is cyclic.
+        if highest_order == len(points):
+            logger.info('Z/%sZ', highest_order)
+        #If not, by Mazur's Theorem the torsion group must be a direct product of Z/2Z
+        #with the cyclic group generated by the highest order point.
+        else:
+            logger.info('Z/2Z x Z/%sZ', highest_order)
+        logger.info('%s', [str(P) for P in points])
+
+#Elliptic Curves over Prime Order Fields ---------------------------------------------------------
+
+class CurveOverFp(Curve):
+    #Scalar multiplication works in Jacobian coordinates unless this is set to False.
+    jacobian = True
+
+    #Construct a Weierstrass cubic y^2 = x^3 + ax^2 + bx + c over Fp.
+    def __init__(self, a, b, c, p):
+        #The number of points and its factorization, filled in when first needed.
+        self.num_points, self.num_points_factors = None, None
+        Curve.__init__(self, a, b, c, p, 1)
+
+    #The secp256k1 curve. Its points form a cyclic group of prime order secp256k1_order.
+    @classmethod
+    def secp256k1(cls):
+        C = cls(0, 0, 7, 2**256-2**32-2**9-2**8-2**7-2**6-2**4-1)
+        C.num_points, C.num_points_factors = secp256k1_order, {secp256k1_order: 1}
+        C.glv = GLV(C, secp256k1_order)
+        return C
+
+    def contains(self, P):
+        if P.is_infinite():
+            return True
+        else:
+            return (P.y*P.y) % self.char == (P.x*P.x*P.x + self.a*P.x*P.x + self.b*P.x + self.c) % self.char
+
+    def get_points(self):
+        return list(self.iter_points())
+
+    #Iterate over the points on the curve, starting with the point at infinity, then in order of
+    #their x and y coordinates. The right hand side of the equation is computed once for each x,
+    #and its square roots (if any) are the y coordinates of points with that x coordinate.
+    def iter_points(self):
+        p = self.char
+        yield Point.atInfinity()
+        for x in range(p):
+            y = sqrt_mod(x*x*x + self.a*x*x + self.b*x + self.c, p)
+            if y is None:
+                continue
+            elif y == (p - y) % p:
+                yield Point(x, y)
+            else:
+                yield Point(x, min(y, p - y))
+                yield Point(x, max(y, p - y))
+
+    #Count the points on the curve (including the point at infinity) without listing them. There
+    #are 1 + (f(x)/p) points with each x coordinate, where f(x) is the right hand side of the
+    #equation and (f(x)/p) is the Legendre symbol.
+    def count_points(self):
+        p = self.char
+        if p == 2:
+            return 1 + sum(1 for P in self.iter_points() if not P.is_infinite())
+        return 1 + sum(1 + legendre(x*x*x + self.a*x*x + self.b*x + self.c, p) for x in range(p))
+
+    #Work with arrays of points on this curve through NumPy. See PointArrays.
+    def arrays(self):
+        return PointArrays(self)
+
+    #Choose a random point on the curve other than the point at infinity.
+    def random_point(self):
+        while True:
+            P = self.lift_x(randrange(self.char))
+            if P is not None:
+                return P if randrange(2) == 0 else self.invert(P)
+
+    #Compute the number of points on the curve, including the point at infinity. Small fields are
+    #counted directly, mid-sized ones with Mestre's baby-step giant-step method, and large ones
+    #with Schoof's algorithm. The result and its factorization are cached on the curve. The points
+    #of a singular curve don't form a group, so none of these methods apply to it.
+    def cardinality(self):
+        if self.num_points is None:
+            p = self.char
+            if self.discriminant() % p == 0:
+                raise ValueError('curve is singular')
+            if p < 1000:
+                self.num_points = self.count_points()
+            elif p.bit_length() <= 64:
+                self.num_points = self.count_points_mestre()
+            else:
+                self.num_points = self.count_points_schoof()
+        return self.num_points
+
+    #The factorization of the number of points, as a dictionary mapping primes to exponents.
+    def cardinality_factors(self):
+        if self.num_points_factors is None:
+            self.num_points_factors = factor(self.cardinality())
+        return self.num_points_factors
+
+    #Compute the order of a point on the curve. It divides the number of points N, so start from N
+    #and divide out prime factors q of N for as long as (N/q)P is still the point at infinity. On
+    #a singular curve N is unknown, so fall back to adding P until reaching the point at infinity.
+    def order(self, P):
+        if self.discriminant() % self.char == 0:
+            return Curve.order(self, P)
+        return self.order_from_multiple(P, self.cardinality(), self.cardinality_factors())
+
+    #Compute the order of P, given a positive multiple M of it with MP the point at infinity.
+    def order_from_multiple(self, P, M, factors=None):
+        if factors is None:
+            factors = factor(M)
+        orderP = M
+        for q, e in factors.items():
+            for i in range(e):
+                if self.mult(P, orderP // q).is_infinite():
+                    orderP //= q
+                else:
+                    break
+        return orderP
+
+    #Return the quadratic twist gy^2 = x^3 + ax^2 + bx + c, for a non-square g. Substituting
+    #X = gx and Y = g^2y turns it into Y^2 = X^3 + agX^2 + bg^2X + cg^3. Its number of points is
+    #2p + 2 - N, where N is the number of points on this curve.
+    def quadratic_twist(self):
+        p = self.char
+        g = 2
+        while legendre(g, p) != -1:
+            g += 1
+        twist = copy(self)
+        twist.a, twist.b, twist.c = self.a*g % p, self.b*g*g % p, self.c*g*g*g % p
+        twist.num_points, twist.num_points_factors = None, None
+        twist.glv = None
+        return twist
+
+    #Find some M with lo <= M <= hi for which MR is the point at infinity, using baby-step giant-step
+    #over the interval. Returns None if there isn't one.
+    def multiple_in_interval(self, R, lo, hi):
+        m = isqrt(hi - lo) + 1
+        #Baby steps jR for 0 < j <= m, keyed by x coordinate. A giant step G = (lo + m + is)R that
+        #matches jR or -jR gives M = lo + m + is - j or lo + m + is + j, where s = 2m + 1.
+        baby_table = {}
+        for j, jR in enumerate(self.progression(R, R, m), 1):
+            #If R has order dividing j, any multiple of j in the interval will do.
+            if jR.is_infinite():
+                M = lo + (-lo) % j
+                return M if M <= hi else None
+            baby_table.setdefault(jR.x, j)
+        s = 2*m + 1
+        start = lo + m
+        for i, G in enumerate(self.progression(self.mult(R, start), self.mult(R, s), (hi - lo) // s + 2)):
+            base = start + i*s
+            if G.is_infinite():
+                candidates = [base]
+            elif G.x in baby_table:
+                j = baby_table[G.x]
+                candidates = [base - j] if G == self.mult(R, j) else [base + j]
+            else:
+                continue
+            for M in candidates:
+                if lo <= M <= hi:
+                    return M
+        return None
+
+    #Count points with Mestre's method. By Hasse's theorem, N = p + 1 - t with |t| <= 2sqrt(p). The
+    #order of a random point R must divide N, and baby-step giant-step finds a multiple of it in the
+    #Hasse interval in about p^(1/4) steps. Points on the quadratic twist likewise constrain
+    #2p + 2 - N. Mestre showed that for p > 229, either the curve or its twist has a point whose
+    #order has a unique multiple in the interval, so this eventually pins down N. Over Fp^n, the
+    #same works with p^n in place of p.
+    def count_points_mestre(self):
+        p = self.char**self.exp
+        lo, hi = p + 1 - isqrt(4*p), p + 1 + isqrt(4*p)
+        twist = self.quadratic_twist()
+        L, L_twist = 1, 1
+        while True:
+            for curve, t_lo, t_hi in ((self, lo, hi), (twist, 2*p + 2 - hi, 2*p + 2 - lo)):
+                R = curve.random_point()
+                M = curve.multiple_in_interval(R, t_lo, t_hi)
+                orderR = curve.order_from_multiple(R, M)
+                if curve is self:
+                    L = L*orderR // gcd(L, orderR)
+                else:
+                    L_twist = L_twist*orderR // gcd(L_twist, orderR)
+            #Wait until one of the orders is big enough that listing its multiples is cheap, then
+            #look for values of N consistent with both.
+            if max(L, L_twist) * 64 > hi - lo:
+                if L >= L_twist:
+                    candidates = [N for N in range(lo + (-lo) % L, hi + 1, L) if (2*p + 2 - N) % L_twist == 0]
+                else:
+                    N_lo = 2*p + 2 - hi
+                    candidates = [2*p + 2 - N for N in range(N_lo + (-N_lo) % L_twist, 2*p + 3 - lo, L_twist)
+                                  if (2*p + 2 - N) % L == 0]
+                if len(candidates) == 1:
+                    return candidates[0]
+
+    #Count points with Schoof's algorithm, which finds the trace t = p + 1 - N modulo enough small
+    #primes l that their product exceeds 4sqrt(p), then uses the Chinese remainder theorem.
+    def count_points_schoof(self):
+        p = self.char
+        #Move to the short Weierstrass form y^2 = x^3 + Ax + B by substituting x - a/3 for x.
+        inv3 = mult_inv(3, p)
+        A = (self.b - self.a*self.a*inv3) % p
+        B = (self.c - self.a*self.b*inv3 + 2*self.a*self.a*self.a*mult_inv(27, p)) % p
+        F = poly_trim([B, A, 0, 1])
+        #The trace is even exactly when there's a point of order 2, i.e. when x^3 + Ax + B has a
+        #root in Fp, which happens when it has a common factor with x^p - x.
+        x_p = PolyModulus(F, p).pow([0, 1], p)
+        residues = [0 if len(poly_gcd(poly_sub(x_p, [0, 1], p), F, p)) > 1 else 1]
+        moduli = [2]
+        division_polys = DivisionPolynomials(A, B, p)
+        l, product = 3, 2
+        while product <= 4*isqrt(p) + 4:
+            if l != p and is_prime(l):
+                residues.append(schoof_trace_mod(l, F, A, p, division_polys[l]))
+                moduli.append(l)
+                product *= l
+            l += 2
+        t, m = crt(residues, moduli)
+        if t > m // 2:
+            t -= m
+        return p + 1 - t
+
+    def invert(self, P):
+        if P.is_infinite():
+            return P
+        else:
+            return Point(P.x, -P.y % self.char)
+
+    #Find the point with the given x coordinate and an even y coordinate, if there is one.
+    def lift_x(self, x):
+        y = sqrt_mod(x*x*x + self.a*x*x + self.b*x + self.c, self.char)
+        if y is None:
+            return None
+        else:
+            return Point(x % self.char, y if y % 2 == 0 else self.char - y)
+
+    #Encode a point as bytes in the SEC1 format. The point at infinity is a single zero byte.
+    #Otherwise, the uncompressed form is 04 followed by x and y, and the compressed form is 02 or 03
+    #(for even or odd y) followed by x, with each coordinate big endian and as long as p.
+    def encode_point(self, P, compressed=True):
+        if P.is_infinite():
+            return b'\x00'
+        size = (self.char.bit_length() + 7) // 8
+        if compressed:
+            return bytes([2 + P.y % 2]) + P.x.to_bytes(size, 'big')
+        else:
+            return b'\x04' + P.x.to_bytes(size, 'big') + P.y.to_bytes(size, 'big')
+
+    #The length of an encoded point, given the first byte of its encoding.
+    def encoded_size(self, prefix):
+        size = (self.char.bit_length() + 7) // 8
+        if prefix == 0:
+            return 1
+        elif prefix in (2, 3):
+            return 1 + size
+        elif prefix == 4:
+            return 1 + 2*size
+        else:
+            raise ValueError('invalid point encoding')
+
+    #Decode a point encoded by encode_point, raising ValueError if the bytes don't encode a point
+    #on this curve. A compressed point costs a square root, which for p = 3 mod 4 (secp256k1 among
+    #others) is a single exponentiation.
+    def decode_point(self, data):
+        data = bytes(data)
+        if not data or len(data) != self.encoded_size(data[0]):
+            raise ValueError('invalid point encoding')
+        if data[0] == 0:
+            return Point.atInfinity()
+        size, p = (self.char.bit_length() + 7) // 8, self.char
+        x = int.from_bytes(data[1:1 + size], 'big')
+        if x >= p:
+            raise ValueError('point is not on the curve')
+        if data[0] == 4:
+            P = Point(x, int.from_bytes(data[1 + size:], 'big'))
+            if P.y >= p or not self.contains(P):
+                raise ValueError('point is not on the curve')
+            return P
+        y = sqrt_mod(x*x*x + self.a*x*x + self.b*x + self.c, p)
+        if y is None:
+            raise ValueError('point is not on the curve')
+        return Point(x, y if y % 2 == data[0] % 2 else (p - y) % p)
+
+    def add(self, P_1, P_2):
+        #Adding points over Fp and can be done in exactly the same way as adding over Q,
+        #but with of the all arithmetic now happening in Fp.
+        y_diff = (P_2.y - P_1.y) % self.char
+        x_diff = (P_2.x - P_1.x) % self.char
+        if P_1.is_infinite():
+            return P_2
+        elif P_2.is_infinite():
+            return P_1
+        elif x_diff == 0 and y_diff != 0:
+            return Point.atInfinity()
+        elif x_diff == 0 and y_diff == 0:
+            if P_1.y == 0:
+                return Point.atInfinity()
+            else:
+                ld = ((3*P_1.x*P_1.x + 2*self.a*P_1.x + self.b) * self.inverse(2*P_1.y)) % self.char
+        else:
+            ld = (y_diff * self.inverse(x_diff)) % self.char
+        nu = (P_1.y - ld*P_1.x) % self.char
+        x = (ld*ld - self.a - P_1.x - P_2.x) % self.char
+        y = (-ld*x - nu) % self.char
+        if self.counts is not None:
+            self.counts['multiplications'] += 4 if x_diff else 5 + (self.a != 0)
+        return Point(x,y)
+
+    #Invert a nonzero element of the field.
+    def inverse(self, a):
+        return mult_inv(a, self.char)
+
+    #Multiply using Jacobian coordinates, where (X,Y,Z) represents the affine point (X/Z^2,Y/Z^3).
+    #Doubling and adding in these coordinates need no field inversions, so a whole scalar
+    #multiplication costs a single inversion when converting the result back to affine form.
+    def engine(self):
+        if not self.jacobian:
+            return Curve.engine(self)
+        else:
+            return (self.to_jacobian, self.from_jacobian_all, self.jacobian_double, self.jacobian_add_affine)
+
+    #Convert an affine point to Jacobian coordinates. The point at infinity is any triple with Z = 0.
+    def to_jacobian(self, P):
+        if P.is_infinite():
+            return (1, 1, 0)
+        else:
+            return (P.x % self.char, P.y % self.char, 1)
+
+    #Convert a point in Jacobian coordinates back to an affine point, using one field inversion.
+    def from_jacobian(self, J):
+        X, Y, Z = J
+        if Z == 0:
+            return Point.atInfinity()
+        p = self.char
+        z_inv = self.inverse(Z)
+        z_inv_sq = z_inv*z_inv % p
+        if self.counts is not None:
+            self.counts['multiplications'] += 4
+        return Point(X*z_inv_sq % p, Y*z_inv_sq*z_inv % p)
+
+    #Convert a list of points in Jacobian coordinates to affine points, sharing one inversion.
+    def from_jacobian_all(self, Js):
+        p = self.char
+        Zs = [J[2] for J in Js if J[2] != 0]
+        z_invs = iter(batch_mult_inv(Zs, p))
+        #Montgomery's trick takes 3k - 2 multiplications for k values, and each point 4 more.
+        if self.counts is not None and Zs:
+            self.counts['multiplications'] += 7*len(Zs) - 2
+        points = []
+        for X, Y, Z in Js:
+            if Z == 0:
+                points.append(Point.atInfinity())
+            else:
+                z_inv = next(z_invs)
+                z_inv_sq = z_inv*z_inv % p
+                points.append(Point(X*z_inv_sq % p, Y*z_inv_sq*z_inv % p))
+        return points
+
+    #Double a point in Jacobian coordinates. With x = X/Z^2 and y = Y/Z^3 substituted in the
+    #affine tangent formulas, the slope becomes M/(2YZ) where M = 3X^2 + 2aXZ^2 + bZ^4.
+    def jacobian_double(self, J):
+        X, Y, Z = J
+        p = self.char
+        #Points on the x-axis have a vertical tangent, so doubling them gives infinity.
+        if Z == 0 or Y == 0:
+            return (1, 1, 0)
+        XX, YY, ZZ = X*X % p, Y*Y % p, Z*Z % p
+        M = 3*XX
+        if self.a != 0:
+            M += 2*self.a*X*ZZ
+        if self.b != 0:
+            M += self.b*ZZ*ZZ
+        M %= p
+        Z_3 = 2*Y*Z % p
+        S = 4*X*YY % p
+        X_3 = M*M - 2*S
+        if self.a != 0:
+            X_3 -= self.a*Z_3*Z_3
+        X_3 %= p
+        Y_3 = (M*(S - X_3) - 8*YY*YY) % p
+        if self.counts is not None:
+            self.counts['multiplications'] += 8 + 4*(self.a != 0) + 2*(self.b != 0)
+        return (X_3, Y_3, Z_3)
+
+    #Add an affine point to a point in Jacobian coordinates (mixed addition). Scaling the affine
+    #point to the same Z gives U = xZ^2 and S = yZ^3, and the secant slope is (S - Y)/(Z(U - X)).
+    def jacobian_add_affine(self, J, P):
+        if P.is_infinite():
+            return J
+        X_1, Y_1, Z_1 = J
+        if Z_1 == 0:
+            return self.to_jacobian(P)
+        p = self.char
+        ZZ = Z_1*Z_1 % p
+        U = P.x*ZZ % p
+        S = P.y*ZZ*Z_1 % p
+        H, R = (U - X_1) % p, (S - Y_1) % p
+        #Equal x coordinates mean the points are equal (so double) or inverses (so infinity).
+        if H == 0:
+            if R == 0:
+                return self.jacobian_double(J)
+            else:
+                return (1, 1, 0)
+        HH = H*H % p
+        HHH = HH*H % p
+        V = X_1*HH % p
+        Z_3 = Z_1*H % p
+        X_3 = R*R - HHH - 2*V
+        if self.a != 0:
+            X_3 -= self.a*Z_3*Z_3
+        X_3 %= p
+        Y_3 = (R*(V - X_3) - Y_1*HHH) % p
+        if self.counts is not None:
+            self.counts['multiplications'] += 11 + 2*(self.a != 0)
+        return (X_3, Y_3, Z_3)
+
+#Elliptic Curves over Prime Power Order Fields ---------------------------------------------------
+
+class CurveOverFq(Curve):
+    #Scalar multiplication works in Jacobian coordinates unless this is set to False. Fields small
+    #enough for log tables invert in a single lookup, so they always use affine coordinates.
+    jacobian = True
+
+    #Construct a Weierstrass cubic y^2 = x^3 + ax^2 + bx + c over Fp^n, where Fp^n is built from
+    #irred_poly as described in FiniteField. The coefficients, and the coordinates of points, are
+    #elements of Fp^n written as integers the same way. Over a field of characteristic 2 curves of
+    #this form are never smooth, so p must be odd.
+    def __init__(self, a, b, c, p, n, irred_poly):
+        if p == 2:
+            raise ValueError('p must be odd')
+        self.field = FiniteField(p, n, irred_poly)
+        self.irred_poly = self.field.modulus
+        #The number of points and its factorization, filled in when first needed.
+        self.num_points, self.num_points_factors = None, None
+        Curve.__init__(self, a, b, c, p, n)
+
+    #Curves over different fields of the same size must not be confused, so include the modulus.
+    def params(self):
+        return (self.a, self.b, self.c, self.char, self.exp, tuple(self.irred_poly))
+
+    def discriminant(self):
+        F = self.field
+        a, b, c = self.a, self.b, self.c
+        terms = [(-4, [a, a, a, c]), (1, [a, a, b, b]), (18, [a, b, c]), (-4, [b, b, b]), (-27, [c, c])]
+        disc = 0
+        for k, factors in terms:
+            term = k % self.char
+            for f in factors:
+                term = F.mul(term, f)
+            disc = F.add(disc, term)
+        return disc
+
+    #Evaluate the right hand side x^3 + ax^2 + bx + c of the equation at x.
+    def rhs(self, x):
+        F = self.field
+        return F.add(F.mul(F.add(F.mul(F.add(x, self.a), x), self.b), x), self.c)
+
+    def contains(self, P):
+        if P.is_infinite():
+            return True
+        else:
+            return self.field.mul(P.y, P.y) == self.rhs(P.x)
+
+    #Iterate over the points on the curve, starting with the point at infinity, then in order of
+    #their x and y coordinates (as integers), with one square root for each x.
+    def iter_points(self):
+        F = self.field
+        yield Point.atInfinity()
+        for x in range(F.q):
+            y = F.sqrt(self.rhs(x))
+            if y is None:
+                continue
+            elif y == 0:
+                yield Point(x, 0)
+            else:
+                yield Point(x, min(y, F.neg(y)))
+                yield Point(x, max(y, F.neg(y)))
+
+    get_points = CurveOverFp.get_points
+
+    #Count the points on the curve without listing them: 2 for each x with f(x) a nonzero square,
+    #1 for each root of f, and the point at infinity.
+    def count_points(self):
+        F = self.field
+        count = 1
+        for x in range(F.q):
+            r = self.rhs(x)
+            count += 1 if r == 0 else 2 if F.is_square(r) else 0
+        return count
+
+    #Choose a random point on the curve other than the point at infinity.
+    def random_point(self):
+        while True:
+            P = self.lift_x(randrange(self.field.q))
+            if P is not None:
+                return P if randrange(2) == 0 else self.invert(P)
+
+    #Find the point with the given x coordinate and the smaller of the two y coordinates, if there
+    #is one.
+    def lift_x(self, x):
+        y = self.field.sqrt(self.rhs(x))
+        if y is None:
+            return None
+        else:
+            return Point(x, min(y, self.field.neg(y)))
+
+    #Compute the number of points on the curve, including the point at infinity. If the
+    #coefficients are all in Fp, count the points over Fp, giving the trace t of Frobenius. The
+    #numbers s_k = a^k + b^k, where a and b are the roots of X^2 - tX + p, satisfy s_0 = 2, s_1 = t
+    #and s_k = ts_(k-1) - ps_(k-2), and there are p^n + 1 - s_n points over Fp^n. Otherwise count
+    #small fields directly and use Mestre's method for the rest. The result is cached.
+    def cardinality(self):
+        if self.num_points is None:
+            p, q = self.char, self.field.q
+            if max(self.a, self.b, self.c) < p:
+                with quiet():
+                    base = CurveOverFp(self.a, self.b, self.c, p)
+                t = p + 1 - base.cardinality()
+                s_prev, s = 2, t
+                for k in range(self.exp - 1):
+                    s_prev, s = s, t*s - p*s_prev
+                self.num_points = q + 1 - s
+            elif q < 1000:
+                self.num_points = self.count_points()
+            else:
+                self.num_points = self.count_points_mestre()
+        return self.num_points
+
+    cardinality_factors = CurveOverFp.cardinality_factors
+    order = CurveOverFp.order
+    order_from_multiple = CurveOverFp.order_from_multiple
+    multiple_in_interval = CurveOverFp.multiple_in_interval
+    count_points_mestre = CurveOverFp.count_points_mestre
+
+    #Return the quadratic twist, as for CurveOverFp.
+    def quadratic_twist(self):
+        F = self.field
+        g = 2
+        while F.is_square(g):
+            g += 1
+        twist = copy(self)
+        twist.a = F.mul(self.a, g)
+        twist.b = F.mul(self.b, F.mul(g, g))
+        twist.c = F.mul(self.c, F.mul(g, F.mul(g, g)))
+        twist.num_points, twist.num_points_factors = None, None
+        return twist
+
+    def invert(self, P):
+        if P.is_infinite():
+            return P
+        else:
+            return Point(P.x, self.field.neg(P.y))
+
+    #Invert a nonzero element of the field.
+    def inverse(self, a):
+        return self.field.inv(a)
+
+    #The same chord and tangent construction as over Fp, with Fp^n arithmetic.
+    def add(self, P_1, P_2):
+        F = self.field
+        if P_1.is_infinite():
+            return P_2
+        elif P_2.is_infinite():
+            return P_1
+        elif P_1.x == P_2.x:
+            if P_1.y != P_2.y or P_1.y == 0:
+                return Point.atInfinity()
+            #The slope of the tangent is (3x^2 + 2ax + b)/2y.
+            x = P_1.x
+            num = F.add(F.mul(F.add(F.mul(3 % self.char, x), F.mul(2 % self.char, self.a)), x), self.b)
+            ld = F.mul(num, self.inverse(F.add(P_1.y, P_1.y)))
+        else:
+            ld = F.mul(F.sub(P_2.y, P_1.y), self.inverse(F.sub(P_2.x, P_1.x)))
+        x = F.sub(F.sub(F.sub(F.mul(ld, ld), self.a), P_1.x), P_2.x)
+        y = F.sub(F.mul(ld, F.sub(P_1.x, x)), P_1.y)
+        if self.counts is not None:
+            self.counts['multiplications'] += 4 if P_1.x == P_2.x else 3
+        return Point(x, y)
+
+    #Multiply in Jacobian coordinates as CurveOverFp does, when inversions are expensive.
+    def engine(self):
+        if not self.jacobian or self.field.tables:
+            return Curve.engine(self)
+        else:
+            return (self.to_jacobian, self.from_jacobian_all, self.jacobian_double, self.jacobian_add_affine)
+
+    def to_jacobian(self, P):
+        if P.is_infinite():
+            return (1, 1, 0)
+        else:
+            return (P.x, P.y, 1)
+
+    #Convert a list of points in Jacobian coordinates to affine points, sharing one inversion
+    #between them with Montgomery's trick, as in batch_mult_inv.
+    def from_jacobian_all(self, Js):
+        F = self.field
+        prefix = [1]
+        for X, Y, Z in Js:
+            prefix.append(F.mul(prefix[-1], Z) if Z != 0 else prefix[-1])
+        #Invert through the field directly: this conversion is counted as the one inversion, and
+        #self.inverse would count a second.
+        inv = F.inv(prefix[-1])
+        points = []
+        for i in range(len(Js) - 1, -1, -1):
+            X, Y, Z = Js[i]
+            if Z == 0:
+                points.append(Point.atInfinity())
+            else:
+                z_inv = F.mul(inv, prefix[i])
+                inv = F.mul(inv, Z)
+                z_inv_sq = F.mul(z_inv, z_inv)
+                points.append(Point(F.mul(X, z_inv_sq), F.mul(Y, F.mul(z_inv_sq, z_inv))))
+        if self.counts is not None:
+            self.counts['multiplications'] += 7*sum(1 for J in Js if J[2] != 0)
+        return points[::-1]
+
+    #Double a point in Jacobian coordinates, with the formulas used by CurveOverFp.
+    def jacobian_double(self, J):
+        F = self.field
+        X, Y, Z = J
+        if Z == 0 or Y == 0:
+            return (1, 1, 0)
+        mul, add, sub = F.mul, F.add, F.sub
+        XX, YY, ZZ = mul(X, X), mul(Y, Y), mul(Z, Z)
+        M = add(add(mul(3 % self.char, XX), mul(mul(2 % self.char, self.a), mul(X, ZZ))),
+                mul(self.b, mul(ZZ, ZZ)))
+        Z_3 = mul(2 % self.char, mul(Y, Z))
+        S = mul(4 % self.char, mul(X, YY))
+        X_3 = sub(sub(sub(mul(M, M), S), S), mul(self.a, mul(Z_3, Z_3)))
+        Y_3 = sub(mul(M, sub(S, X_3)), mul(8 % self.char, mul(YY, YY)))
+        if self.counts is not None:
+            self.counts['multiplications'] += 14
+        return (X_3, Y_3, Z_3)
+
+    #Add an affine point to a point in Jacobian coordinates, with the formulas used by CurveOverFp.
+    def jacobian_add_affine(self, J, P):
+        if P.is_infinite():
+            return J
+        X_1, Y_1, Z_1 = J
+        if Z_1 == 0:
+            return self.to_jacobian(P)
+        F = self.field
+        mul, sub = F.mul, F.sub
+        ZZ = mul(Z_1, Z_1)
+        H, R = sub(mul(P.x, ZZ), X_1), sub(mul(P.y, mul(ZZ, Z_1)), Y_1)
+        if H == 0:
+            if R == 0:
+                return self.jacobian_double(J)
+            else:
+                return (1, 1, 0)
+        HH = mul(H, H)
+        HHH = mul(HH, H)
+        V = mul(X_1, HH)
+        Z_3 = mul(Z_1, H)
+        X_3 = sub(sub(sub(sub(mul(R, R), HHH), V), V), mul(self.a, mul(Z_3, Z_3)))
+        Y_3 = sub(mul(R, sub(V, X_3)), mul(Y_1, HHH))
+        if self.counts is not None:
+            self.counts['multiplications'] += 13
+        return (X_3, Y_3, Z_3)
+
+#Number Theoretic Functions ----------------------------------------------------------------------
+
+#List 0 and the positive and negative divisors of n, in order of absolute value. They're built
+#from the prime factorization of n, and remembered for the next time n comes up.
+def divisors(n):
+    return list(divisors_of_abs(abs(n)))
+
+@lru_cache(maxsize=4096)
+def divisors_of_abs(n):
+    if n == 0:
+        return (0,)
+    divs = [1]
+    for q, e in factor(n).items():
+        divs = [d * q**i for d in divs for i in range(e + 1)]
+    return tuple([0] + [d for i in sorted(divs) for d in (i, -i)])
+
+#Extended Euclidean algorithm.
+def euclid(sml, big):
+    #When the smaller value is zero, it's done, gcd = b = 0*sml + 1*big.
+    if sml == 0:
+        return (big, 0, 1)
+    else:
+        #Repeat with sml and the remainder, big%sml.
+        g, y, x = euclid(big % sml, sml)
+        #Backtrack through the calculation, rewriting the gcd as we go. From the values just
+        #returned above, we have gcd = y*(big%sml) + x*sml, and rewriting big%sml we obtain
+        #gcd = y*(big - (big//sml)*sml) + x*sml = (x - (big//sml)*y)*sml + y*big.
+        return (g, x - (big//sml)*y, y)
+
+#Compute the multiplicative inverse mod n of a with 0 < a < n.
+def mult_inv(a, n):
+    g, x, y = euclid(a, n)
+    #If gcd(a,n) is not one, then a has no multiplicative inverse.
+    if g != 1:
+        raise ValueError('multiplicative inverse does not exist')
+    #If gcd(a,n) = 1, and gcd(a,n) = x*a + y*n, x is the multiplicative inverse of a.
+    else:
+        return x % n
+
+#Invert every value in a list mod n with a single call to mult_inv (Montgomery's trick), by
+#inverting the product of all the values and peeling off one factor at a time.
+def batch_mult_inv(values, n):
+    products = []
+    acc = 1
+    for a in values:
+        acc = acc*a % n
+        products.append(acc)
+    inv = mult_inv(acc, n)
+    invs = [0]*len(values)
+    for i in range(len(values) - 1, 0, -1):
+        invs[i] = inv*products[i-1] % n
+        inv = inv*values[i] % n
+    if values:
+        invs[0] = inv
+    return invs
+
+#Compute the width-w non-adjacent form of a positive integer k, least significant digit first.
+#Each digit is zero or odd with absolute value below 2^(w-1), and any w consecutive digits
+#contain at most one nonzero digit.
+def wnaf(k, w):
+    digits = []
+    while k > 0:
+        if k & 1:
+            d = k & (2**w - 1)
+            if d >= 2**(w-1):
+                d -= 2**w
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+#Find a cube root of 1 mod the prime p other than 1, where p = 1 mod 3.
+def cube_root_of_unity(p):
+    g = 2
+    while pow(g, (p - 1) // 3, p) == 1:
+        g += 1
+    return pow(g, (p - 1) // 3, p)
+
+#Compute the Legendre symbol (a/p) for an odd prime p, which is 0 if p divides a, 1 if a is a
+#nonzero square mod p, and -1 otherwise. By Euler's criterion, it's a^((p-1)/2) mod p.
+def legendre(a, p):
+    l = pow(a, (p-1)//2, p)
+    return -1 if l == p - 1 else l
+
+#Find a square root of a mod the prime p, or return None if a is not a square mod p.
+def sqrt_mod(a, p):
+    a %= p
+    if a == 0 or p == 2:
+        return a
+    #When p = 3 mod 4, a^((p+1)/4) squares to a^((p-1)/2) * a, which is a exactly when a is a
+    #square (by Euler's criterion, below). So one exponentiation both finds and checks the root.
+    if p % 4 == 3:
+        r = pow(a, (p+1)//4, p)
+        return r if r*r % p == a else None
+    #By Euler's criterion, a is a square exactly when a^((p-1)/2) = 1 mod p.
+    if pow(a, (p-1)//2, p) != 1:
+        return None
+    #Otherwise use the Tonelli-Shanks algorithm. Write p - 1 = q*2^e with q odd and find a
+    #non-square z, whose power c = z^q generates the 2-Sylow subgroup of the units mod p.
+    q, e = p - 1, 0
+    while q % 2 == 0:
+        q, e = q // 2, e + 1
+    z = 2
+    while pow(z, (p-1)//2, p) == 1:
+        z += 1
+    c, t, r = pow(z, q, p), pow(a, q, p), pow(a, (q+1)//2, p)
+    #Keep r^2 = ta, and shrink the order of t (a power of 2) until t = 1, at which point r is a
+    #square root of a.
+    while t != 1:
+        i, t_pow = 0, t
+        while t_pow != 1:
+            t_pow, i = t_pow*t_pow % p, i + 1
+        b = pow(c, 2**(e-i-1), p)
+        e, c, t, r = i, b*b % p, t*b*b % p, r*b % p
+    return r
+
+#Test whether n is prime with the Miller-Rabin test. The bases used make the answer certain for
+#n < 3.3*10^24, and extra random bases make errors vanishingly unlikely beyond that.
+def is_prime(n):
+    if n < 2:
+        return False
+    small_primes = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+    for q in small_primes:
+        if n % q == 0:
+            return n == q
+    #Write n - 1 = t*2^e with t odd. For prime n, the sequence a^t, a^2t, ..., a^(n-1) mod n
+    #must either start at 1 or pass through -1.
+    t, e = n - 1, 0
+    while t % 2 == 0:
+        t, e = t // 2, e + 1
+    bases = small_primes if n < 3317044064679887385961981 else small_primes + [randrange(2, n - 1) for i in range(16)]
+    for a in bases:
+        x = pow(a, t, n)
+        if x == 1 or x == n - 1:
+            continue
+        for i in range(e - 1):
+            x = x*x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+#Find a nontrivial factor of the odd composite number n with Pollard's rho method (using Brent's
+#cycle finding), iterating x -> x^2 + c mod n until gcd(x - y, n) exposes a factor.
+def rho_factor(n):
+    while True:
+        c, y = randrange(1, n), randrange(0, n)
+        g, power, steps = 1, 1, 0
+        x = y
+        while g == 1:
+            #The tortoise x jumps to the hare y whenever the number of steps reaches a power of 2.
+            if steps == power:
+                x, power, steps = y, 2*power, 0
+            y = (y*y + c) % n
+            steps += 1
+            g = gcd(x - y, n)
+        if g != n:
+            return g
+
+#Factor n > 0, returning a dictionary mapping each prime factor to its exponent.
+def factor(n):
+    factors = {}
+    #Trial division takes care of small factors quickly.
+    for q in [2, 3, 5] + list(range(7, 1000, 2)):
+        while n % q == 0:
+            factors[q] = factors.get(q, 0) + 1
+            n //= q
+    #Split whatever remains with Pollard's rho until only primes are left.
+    remaining = [n] if n > 1 else []
+    while remaining:
+        m = remaining.pop()
+        if is_prime(m):
+            factors[m] = factors.get(m, 0) + 1
+        else:
+            f = rho_factor(m)
+            remaining += [f, m // f]
+    return factors
+
+#Chinese remainder theorem: find the x mod m_1*m_2*...*m_k with x = a_i mod m_i for each i, where
+#the moduli are pairwise coprime. Returns (x, m_1*m_2*...*m_k).
+def crt(residues, moduli):
+    x, m = 0, 1
+    for a, m_i in zip(residues, moduli):
+        #Lift x mod m to the solution mod m*m_i, adding the right multiple of m.
+        x += m * ((a - x) * mult_inv(m % m_i, m_i) % m_i)
+        m *= m_i
+    return (x % m, m)
+
+#Polynomials over Fp -----------------------------------------------------------------------------
+
+#Polynomials are lists of coefficients mod p, starting with the constant term, with no trailing
+#zero coefficients. The zero polynomial is the empty list.
+
+#Remove trailing zero coefficients.
+def poly_trim(f):
+    while f and f[-1] == 0:
+        f.pop()
+    return f
+
+def poly_add(f, g, p):
+    if len(f) < len(g):
+        f, g = g, f
+    return poly_trim([(c + d) % p for c, d in zip(f, g)] + f[len(g):])
+
+def poly_sub(f, g, p):
+    return poly_add(f, [-d % p for d in g], p)
+
+def poly_scale(f, c, p):
+    return poly_trim([c*d % p for d in f])
+
+#Multiply polynomials by Kronecker substitution: pack the coefficients of each into one big integer,
+#with slots wide enough that no coefficient of the product can overflow into the next, multiply
+#the integers, and unpack the product. Python's big integer multiplication does the real work.
+def poly_mul(f, g, p):
+    if not f or not g:
+        return []
+    width = (2*p.bit_length() + min(len(f), len(g)).bit_length()) // 8 + 1
+    F = int.from_bytes(b''.join(c.to_bytes(width, 'little') for c in f), 'little')
+    G = int.from_bytes(b''.join(c.to_bytes(width, 'little') for c in g), 'little')
+    H = (F*G).to_bytes(width*(len(f) + len(g) - 1), 'little')
+    return poly_trim([int.from_bytes(H[i:i+width], 'little') % p for i in range(0, len(H), width)])
+
+#Long division, returning the quotient and remainder of f divided by g.
+def poly_divmod(f, g, p):
+    f = list(f)
+    lead_inv = mult_inv(g[-1], p)
+    q = [0]*max(len(f) - len(g) + 1, 0)
+    for i in range(len(f) - len(g), -1, -1):
+        c = f[i + len(g) - 1] * lead_inv % p
+        q[i] = c
+        if c != 0:
+            for j, d in enumerate(g):
+                f[i + j] = (f[i + j] - c*d) % p
+    return (poly_trim(q), poly_trim(f[:len(g) - 1]))
+
+#Scale a nonzero polynomial so its leading coefficient is 1.
+def poly_monic(f, p):
+    return poly_scale(f, mult_inv(f[-1], p), p)
+
+#The monic greatest common divisor of f and g.
+def poly_gcd(f, g, p):
+    while g:
+        f, g = g, poly_divmod(f, g, p)[1]
+    return poly_monic(f, p) if f else f
+
+#Raised by PolyModulus.inv when asked to invert a polynomial that shares a factor with the modulus.
+#The monic common factor is stored in the factor attribute.
+class NotInvertibleError(ValueError):
+    def __init__(self, factor):
+        ValueError.__init__(self, 'polynomial is not invertible modulo the given polynomial')
+        self.factor = factor
+
+class PolyModulus(object):
+    #Set up arithmetic in Fp[x]/(h) for a nonconstant polynomial h. Reduction uses Barrett's
+    #method: the quotient of f by h is read off from the product of the reversal of f and a power
+    #series inverse of the reversal of h, so reducing costs two multiplications, not a long division.
+    def __init__(self, h, p):
+        self.h, self.p = poly_monic(h, p), p
+        self.deg = len(self.h) - 1
+        #Compute the inverse of rev(h) mod x^deg by Newton's iteration g -> g(2 - rev(h)g), which
+        #doubles the number of correct coefficients each time.
+        rev_h = self.h[::-1]
+        g, precision = [1], 1
+        while precision < self.deg:
+            precision = min(2*precision, self.deg)
+            e = poly_mul(rev_h[:precision], g, p)[:precision]
+            g = poly_trim(poly_mul(g, poly_sub([2], e, p), p)[:precision])
+        self.rev_h_inv = g
+
+    #Reduce f modulo h.
+    def reduce(self, f):
+        n, d = len(f) - 1, self.deg
+        if n < d:
+            return f
+        elif n > 2*d - 1:
+            return poly_divmod(f, self.h, self.p)[1]
+        #With f = qh + r, the reversal of q is rev(f)/rev(h) mod x^(n-d+1).
+        k = n - d + 1
+        rev_q = poly_mul(f[::-1][:k], self.rev_h_inv[:k], self.p)[:k]
+        q = poly_trim((rev_q + [0]*(k - len(rev_q)))[::-1])
+        return poly_sub(f, poly_mul(q, self.h, self.p), self.p)[:d]
+
+    def mul(self, f, g):
+        return poly_trim(self.reduce(poly_mul(f, g, self.p)))
+
+    #Raise f to the power e by repeated squaring.
+    def pow(self, f, e):
+        result = [1]
+        for bit in bin(e)[2:]:
+            result = self.mul(result, result)
+            if bit == '1':
+                result = self.mul(result, f)
+        return result
+
+    #Invert f modulo h with the extended Euclidean algorithm, keeping s_i with s_i*f = r_i mod h
+    #for each remainder r_i. Raises NotInvertibleError if f and h have a common factor.
+    def inv(self, f):
+        r_0, r_1 = self.h, self.reduce(f)
+        s_0, s_1 = [], [1]
+        while r_1:
+            q, r = poly_divmod(r_0, r_1, self.p)
+            r_0, r_1 = r_1, r
+            s_0, s_1 = s_1, poly_sub(s_0, poly_mul(q, s_1, self.p), self.p)
+        if len(r_0) != 1:
+            raise NotInvertibleError(poly_monic(r_0, self.p))
+        return poly_scale(s_0, mult_inv(r_0[0], self.p), self.p)
+
+class DivisionPolynomials(object):
+    #The division polynomials of y^2 = x^3 + Ax + B over Fp, which vanish exactly at the x
+    #coordinates of points of order n. Odd-index ones are polynomials in x. Even-index ones are y
+    #times a polynomial in x, and only that polynomial is stored. With y^2 replaced by
+    #F = x^3 + Ax + B, the usual recurrences become
+    #  f_(2m+1) = F^2 f_(m+2) f_m^3 - f_(m-1) f_(m+1)^3    (m even)
+    #  f_(2m+1) = f_(m+2) f_m^3 - F^2 f_(m-1) f_(m+1)^3    (m odd)
+    #  f_(2m)   = f_m (f_(m+2) f_(m-1)^2 - f_(m-2) f_(m+1)^2) / 2
+    def __init__(self, A, B, p):
+        self.p = p
+        self.F_sq = poly_mul([B, A, 0, 1], [B, A, 0, 1], p)
+        self.polys = {0: [], 1: [1], 2: [2 % p],
+                      3: poly_trim([-A*A % p, 12*B % p, 6*A % p, 0, 3 % p]),
+                      4: poly_scale(poly_trim([(-8*B*B - A*A*A) % p, -4*A*B % p, -5*A*A % p, 20*B % p,
+                                               5*A % p, 0, 1]), 4, p)}
+
+    def __getitem__(self, n):
+        if n not in self.polys:
+            p, f, m = self.p, self.__getitem__, n // 2
+            if n % 2 == 1:
+                first = poly_mul(f(m+2), poly_mul(f(m), poly_mul(f(m), f(m), p), p), p)
+                second = poly_mul(f(m-1), poly_mul(f(m+1), poly_mul(f(m+1), f(m+1), p), p), p)
+                if m % 2 == 0:
+                    first = poly_mul(self.F_sq, first, p)
+                else:
+                    second = poly_mul(self.F_sq, second, p)
+                self.polys[n] = poly_sub(first, second, p)
+            else:
+                diff = poly_sub(poly_mul(f(m+2), poly_mul(f(m-1), f(m-1), p), p),
+                                poly_mul(f(m-2), poly_mul(f(m+1), f(m+1), p), p), p)
+                self.polys[n] = poly_scale(poly_mul(f(m), diff, p), mult_inv(2, p), p)
+        return self.polys[n]
+
+#Compute the trace of Frobenius t mod the odd prime l for Schoof's algorithm, on the curve
+#y^2 = F(x) = x^3 + Ax + B over Fp, given its l-th division polynomial psi. Frobenius (x,y) ->
+#(x^p, y^p) satisfies phi^2 - t*phi + p = 0, so for any point P of order l, phi^2(P) + (p mod l)P
+#equals t*phi(P), and t mod l is the tau for which tau*phi(P) matches.
+#
+#The computation is symbolic: it works with a generic point of order l, i.e. in the ring
+#Fp[x,y]/(psi(x), y^2 - F(x)). Points are pairs (X, Y) standing for (X(x), Y(x)y), and None is
+#the point at infinity. If a denominator turns out to share a factor with psi, that factor also
+#cuts out a set of points of order l that Frobenius preserves, so start again modulo the factor.
+def schoof_trace_mod(l, F, A, p, psi):
+    h = poly_monic(psi, p)
+    while True:
+        ring = PolyModulus(h, p)
+        F_h = ring.reduce(F)
+        #Add points in the ring. The slope of a secant is (Y_1 - Y_2)y/(X_1 - X_2), and the slope
+        #of a tangent is (3X^2 + A)/(2Yy) = ((3X^2 + A)/(2YF))y.
+        def add(P_1, P_2):
+            if P_1 is None:
+                return P_2
+            elif P_2 is None:
+                return P_1
+            (X_1, Y_1), (X_2, Y_2) = P_1, P_2
+            if X_1 == X_2:
+                if not poly_add(Y_1, Y_2, p):
+                    return None
+                elif Y_1 == Y_2:
+                    ld = ring.mul(poly_add(poly_scale(ring.mul(X_1, X_1), 3, p), [A % p], p),
+                                  ring.inv(poly_scale(ring.mul(Y_1, F_h), 2, p)))
+                else:
+                    #The points agree for some roots of h and are inverses for others.
+                    raise NotInvertibleError(poly_gcd(poly_sub(Y_1, Y_2, p), h, p))
+            else:
+                ld = ring.mul(poly_sub(Y_1, Y_2, p), ring.inv(poly_sub(X_1, X_2, p)))
+            X_3 = poly_sub(poly_sub(ring.mul(ring.mul(ld, ld), F_h), X_1, p), X_2, p)
+            Y_3 = poly_sub(ring.mul(ld, poly_sub(X_1, X_3, p)), Y_1, p)
+            return (X_3, Y_3)
+        try:
+            #Compute phi(P), phi^2(P), and (p mod l)P for the generic point P = (x, y).
+            frob = (ring.pow([0, 1], p), ring.pow(F_h, (p - 1)//2))
+            frob_sq = (ring.pow(frob[0], p), ring.mul(ring.pow(frob[1], p), frob[1]))
+            P, qP = (ring.reduce([0, 1]), [1]), None
+            for bit in bin(p % l)[2:]:
+                qP = add(qP, qP)
+                if bit == '1':
+                    qP = add(qP, P)
+            S = add(frob_sq, qP)
+            if S is None:
+                return 0
+            tau_frob = None
+            for tau in range(1, l):
+                tau_frob = add(tau_frob, frob)
+                if tau_frob == S:
+                    return tau
+            raise ArithmeticError('no trace found modulo ' + str(l))
+        except NotInvertibleError as e:
+            h = e.factor
+
+#Finite Fields of Prime Power Order --------------------------------------------------------------
+
+class FiniteField(object):
+    #Set up the field F_q with q = p^n elements, as polynomials over Fp modulo an irreducible
+    #polynomial of degree n. Like the other polynomials in this module, irred_poly is a list of
+    #coefficients starting with the constant term, so [2, 0, 1] is x^2 + 2. An element
+    #c_0 + c_1x + ... + c_(n-1)x^(n-1) is stored as the integer c_0 + c_1p + ... + c_(n-1)p^(n-1),
+    #so that elements are hashable, the elements of Fp are just 0, ..., p - 1, and the whole field
+    #is range(q). Fields with at most table_size elements precompute log and antilog tables for a
+    #generator g, along with Zech logarithms Z(k) defined by 1 + g^k = g^Z(k), so that every
+    #operation is a few table lookups. Larger fields multiply with Kronecker substitution (packing
+    #each polynomial into one big integer) and invert with the extended Euclidean algorithm.
+    table_size = 2**16
+
+    def __init__(self, p, n, irred_poly):
+        if not is_prime(p):
+            raise ValueError('p must be prime')
+        if len(poly_trim(list(irred_poly))) != n + 1:
+            raise ValueError('irred_poly must have degree n')
+        self.p, self.n, self.q = p, n, p**n
+        self.ring = PolyModulus([c % p for c in irred_poly], p)
+        self.modulus = self.ring.h
+        #x^n = -(h_0 + h_1x + ... + h_(n-1)x^(n-1)) mod h, so reducing a coefficient of x^k for
+        #k >= n only touches the lower coefficients where h is nonzero.
+        self.tail = [(j, -c % p) for j, c in enumerate(self.modulus[:n]) if c]
+        if not self.irreducible():
+            raise ValueError('irred_poly is not irreducible over F_' + str(p))
+        self.tables = self.q <= self.table_size
+        if self.tables:
+            self.build_tables()
+
+    #Rabin's test: h of degree n is irreducible exactly when it divides x^(p^n) - x, but has no
+    #common factor with x^(p^(n/r)) - x for any prime r dividing n.
+    def irreducible(self):
+        p, n = self.p, self.n
+        x = self.ring.reduce([0, 1])
+        if self.ring.pow(x, p**n) != x:
+            return False
+        for r in factor(n):
+            if len(poly_gcd(poly_sub(self.ring.pow(x, p**(n // r)), x, p), self.modulus, p)) > 1:
+                return False
+        return True
+
+    #Convert between elements and their lists of coefficients.
+    def to_poly(self, a):
+        f = []
+        while a:
+            a, c = divmod(a, self.p)
+            f.append(c)
+        return f
+
+    def from_poly(self, f):
+        a = 0
+        for c in reversed(f):
+            a = a*self.p + c
+        return a
+
+    #Find a generator of the multiplicative group, then tabulate its powers (twice over, so that a
+    #sum of two logs needs no reduction), the logs of the nonzero elements, and the Zech logs.
+    def build_tables(self):
+        q = self.q
+        primes = factor(q - 1)
+        g = 2 if q > 2 else 1
+        while any(self.slow_pow(g, (q - 1) // r) == 1 for r in primes):
+            g += 1
+        g_poly = self.to_poly(g)
+        self.exp = [1]
+        for i in range(2*(q - 1)):
+            self.exp.append(self.from_poly(self.ring.mul(self.to_poly(self.exp[-1]), g_poly)))
+        self.log = [None]*q
+        for i in range(q - 1):
+            self.log[self.exp[i]] = i
+        #Adding 1 only changes the constant coefficient. Z(k) is None when 1 + g^k = 0.
+        self.zech = []
+        for i in range(q - 1):
+            a = self.exp[i]
+            self.zech.append(self.log[a - a % self.p + (a % self.p + 1) % self.p])
+        self.half = (q - 1) // 2 if self.p != 2 else 0
+
+    def slow_pow(self, a, e):
+        return self.from_poly(self.ring.pow(self.to_poly(a), e))
+
+    def add(self, a, b):
+        if a == 0:
+            return b
+        elif b == 0:
+            return a
+        elif self.p == 2:
+            return a ^ b
+        elif self.tables:
+            #g^i + g^j = g^i(1 + g^(j-i)) = g^(i + Z(j-i)).
+            i = self.log[a]
+            z = self.zech[(self.log[b] - i) % (self.q - 1)]
+            return 0 if z is None else self.exp[i + z]
+        else:
+            return self.from_poly(poly_add(self.to_poly(a), self.to_poly(b), self.p))
+
+    def neg(self, a):
+        if a == 0 or self.p == 2:
+            return a
+        elif self.tables:
+            #-1 = g^((q-1)/2).
+            return self.exp[self.log[a] + self.half]
+        else:
+            return self.from_poly([self.p - c if c else 0 for c in self.to_poly(a)])
+
+    def sub(self, a, b):
+        return self.add(a, self.neg(b))
+
+    def mul(self, a, b):
+        if a == 0 or b == 0:
+            return 0
+        elif self.tables:
+            return self.exp[self.log[a] + self.log[b]]
+        f, g = self.to_poly(a), self.to_poly(b)
+        #Multiply short polynomials directly, and longer ones by Kronecker substitution.
+        if self.n <= 8:
+            prod = [0]*(len(f) + len(g) - 1)
+            for i, c in enumerate(f):
+                if c:
+                    for j, d in enumerate(g):
+                        prod[i + j] += c*d
+        else:
+            prod = poly_mul(f, g, self.p)
+        return self.from_poly(self.reduce(prod))
+
+    #Reduce the coefficients of a polynomial of degree less than 2n modulo h and p, working down
+    #from the top coefficient.
+    def reduce(self, f):
+        p, n = self.p, self.n
+        for k in range(len(f) - 1, n - 1, -1):
+            c = f[k] % p
+            if c:
+                for j, t in self.tail:
+                    f[k - n + j] += c*t
+        return [c % p for c in f[:n]]
+
+    #Invert a nonzero element. Raises ZeroDivisionError for 0.
+    def inv(self, a):
+        if a == 0:
+            raise ZeroDivisionError('0 has no inverse')
+        elif self.tables:
+            return self.exp[self.q - 1 - self.log[a]]
+        else:
+            return self.from_poly(self.ring.inv(self.to_poly(a)))
+
+    def pow(self, a, e):
+        if e < 0:
+            a, e = self.inv(a), -e
+        if a == 0:
+            return 1 if e == 0 else 0
+        elif self.tables:
+            return self.exp[self.log[a] * e % (self.q - 1)]
+        else:
+            return self.slow_pow(a, e)
+
+    #Decide whether a is a square, by Euler's criterion (or the parity of its log).
+    def is_square(self, a):
+        if a == 0 or self.p == 2:
+            return True
+        elif self.tables:
+            return self.log[a] % 2 == 0
+        else:
+            return self.pow(a, (self.q - 1) // 2) == 1
+
+    #Find a square root of a, or return None if a is not a square. Same method as sqrt_mod.
+    def sqrt(self, a):
+        q = self.q
+        if a == 0:
+            return 0
+        elif self.p == 2:
+            return self.pow(a, q // 2)
+        elif self.tables:
+            l = self.log[a]
+            return self.exp[l // 2] if l % 2 == 0 else None
+        elif not self.is_square(a):
+            return None
+        elif q % 4 == 3:
+            return self.pow(a, (q + 1) // 4)
+        #Tonelli-Shanks, with q - 1 = 2^s*t for odd t.
+        s, t = 0, q - 1
+        while t % 2 == 0:
+            s, t = s + 1, t // 2
+        z = 2
+        while self.is_square(z):
+            z += 1
+        m, c, u, r = s, self.pow(z, t), self.pow(a, t), self.pow(a, (t + 1) // 2)
+        while u != 1:
+            i, u_sq = 0, u
+            while u_sq != 1:
+                u_sq = self.mul(u_sq, u_sq)
+                i += 1
+            b = self.pow(c, 2**(m - i - 1))
+            m, c = i, self.mul(b, b)
+            u, r = self.mul(u, c), self.mul(r, b)
+        return r
+
+#NumPy Arrays of Points --------------------------------------------------------------------------
+
+class PointArrays(object):
+    #Work with many points on a curve over Fp at once, as NumPy arrays of coordinates instead of
+    #Point objects. A batch of points is a pair of int64 arrays (X, Y), with the point at infinity
+    #stored as x = -1, y = 0. With p < 2^31 the product of two reduced values fits in an int64, so
+    #every operation is an array operation followed by a reduction mod p. Products are always of
+    #reduced values: 4XY is computed as 4(XY mod p), since 4XY itself could overflow. Square roots
+    #come from a table of all of them when p is at most table_size, and from Tonelli-Shanks run on
+    #the whole array at once otherwise. Inversion uses Fermat's little theorem, a^-1 = a^(p-2),
+    #which is also just array operations. Points are enumerated, and BSGS steps computed, chunk
+    #elements at a time.
+    table_size = 2**24
+    chunk = 2**20
+
+    def __init__(self, curve):
+        if np is None:
+            raise ImportError('PointArrays needs NumPy')
+        p = curve.char
+        if p >= 2**31:
+            raise ValueError('PointArrays needs p < 2^31')
+        self.curve, self.p = curve, p
+        self.a, self.b, self.c = curve.a % p, curve.b % p, curve.c % p
+        self.a_2 = 2 * self.a % p
+        if p <= self.table_size:
+            #Each y <= p/2 is stored as the root of y^2, and -1 marks non-squares.
+            self.roots = np.full(p, -1, dtype=np.int32)
+            ys = np.arange(p // 2 + 1, dtype=np.int64)
+            self.roots[ys * ys % p] = ys
+        else:
+            self.roots = None
+            self.s, self.t = 0, p - 1
+            while self.t % 2 == 0:
+                self.s, self.t = self.s + 1, self.t // 2
+            z = 2
+            while legendre(z, p) != -1:
+                z += 1
+            self.z_t = pow(z, self.t, p)
+
+    #Convert between lists of Point objects and arrays.
+    def from_points(self, points):
+        X = np.array([-1 if P.is_infinite() else P.x % self.p for P in points], dtype=np.int64)
+        Y = np.array([0 if P.is_infinite() else P.y % self.p for P in points], dtype=np.int64)
+        return X, Y
+
+    def to_points(self, X, Y):
+        return [Point.atInfinity() if x < 0 else Point(int(x), int(y)) for x, y in zip(X, Y)]
+
+    def rhs(self, X):
+        p = self.p
+        return (((X + self.a) % p * X % p + self.b) % p * X % p + self.c) % p
+
+    #Raise each element of A to the power e.
+    def pow(self, A, e):
+        p = self.p
+        result = np.ones_like(A)
+        base = A % p
+        while e:
+            if e & 1:
+                result = result * base % p
+            base = base * base % p
+            e >>= 1
+        return result
+
+    #Invert each element of A. Zeros stay zero.
+    def inverse(self, A):
+        return self.pow(A, self.p - 2)
+
+    #Find a square root of each element of A, with -1 for non-squares.
+    def sqrt(self, A):
+        p = self.p
+        A = A % p
+        if self.roots is not None:
+            return self.roots[A].astype(np.int64)
+        roots = np.full(A.shape, -1, dtype=np.int64)
+        roots[A == 0] = 0
+        squares = (A != 0) & (self.pow(A, (p - 1) // 2) == 1)
+        a = A[squares]
+        #Tonelli-Shanks, as in sqrt_mod, with every step applied to the elements that aren't done.
+        m = np.full(a.shape, self.s, dtype=np.int64)
+        c = np.full(a.shape, self.z_t, dtype=np.int64)
+        u, r = self.pow(a, self.t), self.pow(a, (self.t + 1) // 2)
+        active = u != 1
+        while active.any():
+            #Find the least i with u^(2^i) = 1, and b = c^(2^(m-i-1)).
+            i, w = np.zeros_like(m), u.copy()
+            for k in range(1, self.s):
+                w = w * w % p
+                i[(i == 0) & (w == 1) & active] = k
+            b, e = c.copy(), m - i - 1
+            for j in range(self.s - 1):
+                b = np.where(j < e, b * b % p, b)
+            c = np.where(active, b * b % p, c)
+            r = np.where(active, r * b % p, r)
+            u = np.where(active, u * c % p, u)
+            m = np.where(active, i, m)
+            active = u != 1
+        roots[squares] = r
+        return roots
+
+    #All the points on the curve, the point at infinity first and then in order of x and y, as in
+    #CurveOverFp.get_points.
+    def points(self):
+        p = self.p
+        Xs, Ys = [np.array([-1], dtype=np.int64)], [np.array([0], dtype=np.int64)]
+        for start in range(0, p, self.chunk):
+            x = np.arange(start, min(start + self.chunk, p), dtype=np.int64)
+            y = self.sqrt(self.rhs(x))
+            x, y = x[y >= 0], y[y >= 0]
+            lo, hi = np.minimum(y, (p - y) % p), np.maximum(y, (p - y) % p)
+            #Interleave (x, lo) and (x, hi), dropping the second copy when y = 0.
+            X, Y = np.repeat(x, 2), np.stack([lo, hi], axis=1).ravel()
+            keep = np.ones(len(X), dtype=bool)
+            keep[1::2] = hi != lo
+            Xs.append(X[keep])
+            Ys.append(Y[keep])
+        return np.concatenate(Xs), np.concatenate(Ys)
+
+    #Count the points on the curve, including the point at infinity.
+    def count(self):
+        p = self.p
+        total = 1
+        for start in range(0, p, self.chunk):
+            r = self.rhs(np.arange(start, min(start + self.chunk, p), dtype=np.int64))
+            y = self.sqrt(r)
+            total += 2*int(np.count_nonzero(y > 0)) + int(np.count_nonzero(y == 0))
+        return total
+
+    def invert(self, X, Y):
+        return X, np.where(X < 0, 0, (-Y) % self.p)
+
+    #Add the points (X_1, Y_1) and (X_2, Y_2) elementwise, in affine coordinates.
+    def add(self, X_1, Y_1, X_2, Y_2):
+        p = self.p
+        X_1, Y_1, X_2, Y_2 = np.broadcast_arrays(X_1, Y_1, X_2, Y_2)
+        inf_1, inf_2 = X_1 < 0, X_2 < 0
+        same_x = (X_1 == X_2) & ~inf_1 & ~inf_2
+        double = same_x & (Y_1 == Y_2) & (Y_1 != 0)
+        #Slope of the tangent (3x^2 + 2ax + b)/2y when doubling, of the secant otherwise.
+        tangent = (3 * (X_1 * X_1 % p) + self.a_2 * X_1 + self.b) % p
+        num = np.where(double, tangent, (Y_2 - Y_1) % p)
+        den = np.where(double, 2 * Y_1 % p, (X_2 - X_1) % p)
+        ld = num * self.inverse(den) % p
+        X_3 = (ld * ld - self.a - X_1 - X_2) % p
+        Y_3 = (ld * ((X_1 - X_3) % p) - Y_1) % p
+        X_3 = np.where(same_x & ~double, -1, X_3)
+        Y_3 = np.where(same_x & ~double, 0, Y_3)
+        X_3, Y_3 = np.where(inf_1, X_2, X_3), np.where(inf_1, Y_2, Y_3)
+        return np.where(inf_2, X_1, X_3), np.where(inf_2, Y_1, Y_3)
+
+    #Double points in Jacobian coordinates, with the formulas of CurveOverFp.jacobian_double.
+    def jacobian_double(self, X, Y, Z):
+        p = self.p
+        XX, YY, ZZ = X * X % p, Y * Y % p, Z * Z % p
+        M = (3 * XX + self.a_2 * X % p * ZZ + self.b * ZZ % p * ZZ) % p
+        Z_3 = 2 * (Y * Z % p) % p
+        S = 4 * (X * YY % p) % p
+        X_3 = (M * M - 2 * S - self.a * Z_3 % p * Z_3) % p
+        Y_3 = (M * ((S - X_3) % p) - 8 * (YY * YY % p)) % p
+        inf = (Z == 0) | (Y == 0)
+        return np.where(inf, 1, X_3), np.where(inf, 1, Y_3), np.where(inf, 0, Z_3)
+
+    #Add affine points (x, y) to points in Jacobian coordinates, as in
+    #CurveOverFp.jacobian_add_affine.
+    def jacobian_add_affine(self, X_1, Y_1, Z_1, x, y):
+        p = self.p
+        ZZ = Z_1 * Z_1 % p
+        H = (x * ZZ - X_1) % p
+        R = (y * ZZ % p * Z_1 - Y_1) % p
+        HH = H * H % p
+        HHH = HH * H % p
+        V = X_1 * HH % p
+        Z_3 = Z_1 * H % p
+        X_3 = (R * R - HHH - 2 * V - self.a * Z_3 % p * Z_3) % p
+        Y_3 = (R * ((V - X_3) % p) - Y_1 * HHH) % p
+        #Equal x coordinates mean the points are equal (so double) or inverses (so infinity).
+        D_X, D_Y, D_Z = self.jacobian_double(X_1, Y_1, Z_1)
+        same, opposite = (H == 0) & (R == 0), (H == 0) & (R != 0)
+        X_3, Y_3, Z_3 = [np.where(same, D, T) for D, T in ((D_X, X_3), (D_Y, Y_3), (D_Z, Z_3))]
+        X_3, Y_3, Z_3 = np.where(opposite, 1, X_3), np.where(opposite, 1, Y_3), np.where(opposite, 0, Z_3)
+        #Either point could be the point at infinity.
+        inf_1, inf_2 = Z_1 == 0, x < 0
+        X_3, Y_3, Z_3 = np.where(inf_1, x, X_3), np.where(inf_1, y, Y_3), np.where(inf_1, 1, Z_3)
+        return np.where(inf_2, X_1, X_3), np.where(inf_2, Y_1, Y_3), np.where(inf_2, Z_1, Z_3)
+
+    def from_jacobian(self, X, Y, Z):
+        p = self.p
+        z_inv = self.inverse(Z)
+        z_inv_sq = z_inv * z_inv % p
+        x, y = X * z_inv_sq % p, Y * z_inv_sq % p * z_inv % p
+        return np.where(Z == 0, -1, x), np.where(Z == 0, 0, y)
+
+    #Compute K_iP_i for each point P_i = (X_i, Y_i), where K is one integer or an array of them
+    #smaller than 2^63, by double and add in Jacobian coordinates with one inversion at the end.
+    def mult(self, X, Y, K):
+        X, Y, K = np.broadcast_arrays(np.asarray(X, dtype=np.int64), np.asarray(Y, dtype=np.int64),
+                                      np.asarray(K, dtype=np.int64))
+        Y = np.where(K < 0, self.invert(X, Y)[1], Y)
+        K = np.abs(K)
+        R_X, R_Y, R_Z = np.ones_like(X), np.ones_like(X), np.zeros_like(X)
+        for j in range(int(K.max(initial=0)).bit_length() - 1, -1, -1):
+            R_X, R_Y, R_Z = self.jacobian_double(R_X, R_Y, R_Z)
+            A_X, A_Y, A_Z = self.jacobian_add_affine(R_X, R_Y, R_Z, X, Y)
+            bit = (K >> j) & 1 == 1
+            R_X, R_Y, R_Z = np.where(bit, A_X, R_X), np.where(bit, A_Y, R_Y), np.where(bit, A_Z, R_Z)
+        return self.from_jacobian(R_X, R_Y, R_Z)
+
+    #Compute the order of each point, dividing prime factors out of the number of points N as
+    #CurveOverFp.order does, for all the points at once.
+    def orders(self, X, Y):
+        N = self.curve.cardinality()
+        orders = np.full(np.shape(X), N, dtype=np.int64)
+        for q, e in self.curve.cardinality_factors().items():
+            for i in range(e):
+                divisible = orders % q == 0
+                candidates = np.where(divisible, orders // q, orders)
+                inf = self.mult(X, Y, candidates)[0] < 0
+                orders = np.where(divisible & inf, candidates, orders)
+        return orders
+
+    #The multiples 0P, P, 2P, ..., (count - 1)P of a Point P, as arrays. Each round adds kP to
+    #the k multiples found so far, doubling their number with one array addition.
+    def multiples(self, P, count):
+        X, Y = self.from_points([Point.atInfinity()])
+        while len(X) < count:
+            S = self.curve.mult(P, len(X))
+            X_2, Y_2 = self.add(X, Y, *self.from_points([S]))
+            X, Y = np.concatenate([X, X_2]), np.concatenate([Y, Y_2])
+        return X[:count], Y[:count]
+
+    #The multiples of P, from the point at infinity up to (n-1)P where n is the order of P, as
+    #arrays. These are the points generated by Curve.generate.
+    def generate(self, P):
+        return self.multiples(P, self.curve.order(P))
+
+    #The points R, R + S, ..., R + (count - 1)S, as arrays.
+    def progression(self, R, S, count):
+        X, Y = self.multiples(S, count)
+        return self.add(X, Y, *self.from_points([R]))
+
+    #Find d with Q = dP, where P has order n, by baby-step giant-step. The baby steps jP for
+    #0 <= j < m are sorted by x coordinate, and the giant steps Q - imP are looked up in them with
+    #a binary search, chunk at a time. Returns None if Q is not a multiple of P.
+    def discrete_log(self, P, Q, n):
+        curve = self.curve
+        m = isqrt(n - 1) + 1
+        B_X, B_Y = self.multiples(P, m)
+        order = np.argsort(B_X, kind='stable')
+        keys = B_X[order]
+        step = curve.invert(curve.mult(P, m))
+        for start in range(0, m + 1, self.chunk):
+            R = curve.add(Q, curve.mult(step, start))
+            G_X, G_Y = self.progression(R, step, min(self.chunk, m + 1 - start))
+            pos = np.minimum(np.searchsorted(keys, G_X), m - 1)
+            for i in np.flatnonzero(keys[pos] == G_X):
+                #Q - (start + i)mP shares its x coordinate with jP, so it's jP or -jP.
+                j = int(order[pos[i]])
+                g = (start + int(i)) * m
+                for d in ((g + j) % n, (g - j) % n):
+                    if curve.mult(P, d) == Q:
+                        return d
+        return None
+
+#GLV Endomorphisms -------------------------------------------------------------------------------
+
+class GLV(object):
+    #On a curve y^2 = x^3 + c over Fp with p = 1 mod 3, the map phi(x,y) = (beta*x, y), where beta
+    #is a cube root of 1 mod p other than 1, takes points to points and respects addition. If the
+    #points form a cyclic group of prime order n, phi must then act as multiplication by some cube
+    #root lam of 1 mod n. So kP = k_1P + k_2phi(P) whenever k = k_1 + k_2*lam mod n, and k_1, k_2
+    #can be chosen with about half as many bits as n. Computing phi(P) takes one multiplication,
+    #and computing k_1P + k_2phi(P) together takes half the doublings of computing kP directly.
+    #This is the method of Gallant, Lambert and Vanstone. Setting curve.glv = GLV(curve, n) makes
+    #multi_mult (and so mult) use it.
+    def __init__(self, curve, n):
+        p = curve.char
+        if curve.a != 0 or curve.b != 0 or p % 3 != 1 or not is_prime(n) or n % 3 != 1:
+            raise ValueError('curve has no GLV endomorphism')
+        #If nP is the point at infinity for some point P, then n divides the number of points N.
+        #By the Hasse bound N <= p + 1 + 2sqrt(p), so if that's less than 2n, then N = n.
+        P = curve.random_point()
+        while P.is_infinite():
+            P = curve.random_point()
+        if p + 2*isqrt(p) + 3 >= 2*n or not curve.mult(P, n).is_infinite():
+            raise ValueError('the points of the curve must form a group of order n')
+        self.p, self.n = p, n
+        self.beta, self.lam = cube_root_of_unity(p), cube_root_of_unity(n)
+        #Of the two choices of lam, pick the one matching beta.
+        if curve.mult(P, self.lam) != self.phi(P):
+            self.lam = self.lam * self.lam % n
+        self.basis = self.short_basis()
+
+    def phi(self, P):
+        if P.is_infinite():
+            return P
+        return Point(self.beta * P.x % self.p, P.y)
+
+    #Find two short vectors (a_1, b_1), (a_2, b_2) spanning the lattice of pairs (a, b) with
+    #a + b*lam = 0 mod n. Every remainder r_i in the extended Euclidean algorithm applied to n and
+    #lam satisfies r_i = t_i*lam mod n, so (r_i, -t_i) is in the lattice, and the ones where r_i
+    #passes sqrt(n) are short (Guide to Elliptic Curve Cryptography, algorithm 3.74).
+    def short_basis(self):
+        n = self.n
+        r_0, r_1, t_0, t_1 = n, self.lam, 0, 1
+        while r_1 * r_1 >= n:
+            q = r_0 // r_1
+            r_0, r_1, t_0, t_1 = r_1, r_0 - q*r_1, t_1, t_0 - q*t_1
+        #Now r_0 is the last remainder at least sqrt(n), and r_1 the first one below it.
+        q = r_0 // r_1
+        r_2, t_2 = r_0 - q*r_1, t_0 - q*t_1
+        a_1, b_1 = r_1, -t_1
+        if r_0*r_0 + t_0*t_0 <= r_2*r_2 + t_2*t_2:
+            a_2, b_2 = r_0, -t_0
+        else:
+            a_2, b_2 = r_2, -t_2
+        return (a_1, b_1), (a_2, b_2)
+
+    #Write k = k_1 + k_2*lam mod n, with k_1 and k_2 about sqrt(n) in absolute value, by
+    #subtracting the lattice vector closest to (k, 0).
+    def split(self, k):
+        n = self.n
+        (a_1, b_1), (a_2, b_2) = self.basis
+        k %= n
+        c_1 = (2*b_2*k + n) // (2*n)
+        c_2 = (-2*b_1*k + n) // (2*n)
+        return k - c_1*a_1 - c_2*a_2, -c_1*b_1 - c_2*b_2
+
+#Fixed Base Precomputation -----------------------------------------------------------------------
+
+#Precomputed tables built by fixed_base_mult or loaded from a file, keyed by curve and base point.
+fixed_base_tables = {}
+
+#Window width of the tables built by fixed_base_mult. A table for L-bit scalars holds
+#ceil(L/w)*(2^w - 1) points, so raising this trades memory for fewer additions.
+fixed_base_window = 4
+
+class FixedBaseTable(object):
+    #Precompute j*2^(wi)P for 0 < j < 2^w and 0 <= i < ceil(bits/w). Any k with at most the given
+    #number of bits is then a sum of one table entry for each w-bit digit of k, so computing kP
+    #takes about bits/w additions and no doublings at all.
+    def __init__(self, curve, P, bits, window=4, rows=None):
+        self.curve, self.P = curve, P
+        self.bits, self.window = bits, window
+        self.rows = rows if rows is not None else self.build()
+
+    def build(self):
+        lift, lower_all, double, add = self.curve.engine()
+        rows = []
+        base = self.P
+        for i in range((self.bits + self.window - 1) // self.window):
+            #Each row holds the multiples B, 2B, ..., (2^w - 1)B of its base B, and the base of
+            #the next row is 2^w B. Convert all of them to affine points with one inversion.
+            row = [lift(base)]
+            for j in range(2**self.window - 1):
+                row.append(add(row[-1], base))
+            row = lower_all(row)
+            base = row.pop()
+            rows.append(row)
+        return rows
+
+    #Compute kP by adding the table entry for each w-bit digit of k. The arithmetic is done on the
+    #given curve, which defaults to the one the table was built on, and must have the same params.
+    def mult(self, k, curve=None):
+        curve = self.curve if curve is None else curve
+        if k < 0 or k.bit_length() > self.bits:
+            return curve.mult(self.P, k)
+        if curve.counts is not None:
+            curve.counts['scalar_mults'] += 1
+        lift, lower_all, double, add = curve.engine()
+        mask = 2**self.window - 1
+        R = lift(Point.atInfinity())
+        for row in self.rows:
+            if k & mask:
+                R = add(R, row[(k & mask) - 1])
+            k >>= self.window
+        return lower_all([R])[0]
+
+    #Write the table to a file as JSON, so that other processes can load it instead of
+    #building it again.
+    def save(self, filename):
+        data = {'curve': list(self.curve.params()), 'P': [self.P.x, self.P.y],
+                'bits': self.bits, 'window': self.window,
+                'rows': [[None if T.is_infinite() else [T.x, T.y] for T in row] for row in self.rows]}
+        with open(filename, 'w') as f:
+            json.dump(data, f)
+
+    #Read a table written by save, check that it belongs to the given curve, and make it
+    #available to fixed_base_mult, whatever its window width. The entries go straight into keys
+    #and signatures, so the file must come from a trusted source: a crafted table (whose author
+    #knows the discrete log of each entry) would reveal k, and so d, through r. By default only
+    #cheap checks are made, which catch most accidental damage: the shape of the table, that every
+    #entry is on the curve, and a few entries chosen at random. Pass full_check=True for a file
+    #that can't be trusted, which checks every entry but costs about as much as a build.
+    @classmethod
+    def load(cls, curve, filename, full_check=False):
+        with open(filename) as f:
+            data = json.load(f)
+        if tuple(data['curve']) != curve.params():
+            raise ValueError('table was built for a different curve')
+        P = Point(*data['P'])
+        bits, window = data['bits'], data['window']
+        rows = [[Point.atInfinity() if T is None else Point(*T) for T in row] for row in data['rows']]
+        check = cls.check if full_check else cls.spot_check
+        if not curve.contains(P) or not check(curve, P, bits, window, rows):
+            raise ValueError('table is not a valid fixed base table')
+        table = cls(curve, P, bits, window, rows)
+        fixed_base_tables[(curve.params(), P.x, P.y)] = table
+        return table
+
+    #Check the shape of the rows, that every entry is on the curve, and that a few random entries
+    #are the right multiples of P: entry j of row i should be (j + 1)2^(wi)P.
+    @staticmethod
+    def spot_check(curve, P, bits, window, rows, samples=8):
+        if not FixedBaseTable.check_shape(bits, window, rows):
+            return False
+        if not all(curve.contains(T) for row in rows for T in row):
+            return False
+        for t in range(samples if rows else 0):
+            i, j = randrange(len(rows)), randrange(2**window - 1)
+            if rows[i][j] != curve.mult(P, (j + 1) << (window*i)):
+                return False
+        return True
+
+    #Check that there are ceil(bits/w) rows of 2^w - 1 entries each.
+    @staticmethod
+    def check_shape(bits, window, rows):
+        if window < 1 or len(rows) != (bits + window - 1) // window:
+            return False
+        return all(len(row) == 2**window - 1 for row in rows)
+
+    #Check every entry of the rows. Each row must hold B, 2B, ..., (2^w - 1)B for its base B, and
+    #each base must be 2^w times the one before, starting from P. This costs about as much as
+    #building the table.
+    @staticmethod
+    def check(curve, P, bits, window, rows):
+        lift, lower_all, double, add = curve.engine()
+        if not FixedBaseTable.check_shape(bits, window, rows):
+            return False
+        base = P
+        for row in rows:
+            expected = [lift(base)]
+            for j in range(2**window - 1):
+                expected.append(add(expected[-1], base))
+            expected = lower_all(expected)
+            if row != expected[:-1]:
+                return False
+            base = expected[-1]
+        return True
+
+#Compute kP for 0 <= k < 2^bits using a cached or loaded table for the base point P, building
+#the table the first time P is used as a base on this curve, or when the table is too small.
+def fixed_base_mult(curve, P, k, bits):
+    key = (curve.params(), P.x, P.y)
+    table = fixed_base_tables.get(key)
+    if table is None or table.bits < bits:
+        table = FixedBaseTable(curve, P, bits, fixed_base_window)
+        fixed_base_tables[key] = table
+    return table.mult(k, curve)
+
+#Caches ------------------------------------------------------------------------------------------
+
+class LRUCache(object):
+    #A dictionary holding at most maxsize entries, which evicts the least recently used entry to
+    #make room for a new one. A maxsize of zero turns the cache off.
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    #Return the value stored for key, or None if there isn't one.
+    def get(self, key):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        else:
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    #Remove the entry for key, returning whether there was one.
+    def evict(self, key):
+        return self.entries.pop(key, None) is not None
+
+    #Change the maximum size, evicting the least recently used entries if there are too many.
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        while len(self.entries) > max(maxsize, 0):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    #Remove all entries and reset the statistics.
+    def clear(self):
+        self.entries.clear()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def stats(self):
+        return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+#Public keys that passed validation, keyed by (curve.params(), n, Q.x, Q.y). Checking that Q has
+#order dividing n takes a full scalar multiplication, so verify only does it once per key.
+pubkey_cache = LRUCache(1024)
+
+#Results of verify, keyed by (curve.params(), P.x, P.y, n, Q.x, Q.y, z, r, s) where z is the
+#truncated hash of the message. Off unless given a size, e.g. verify_cache.resize(4096).
+verify_cache = LRUCache(0)
+
+#Check that Q is a point of order dividing n on the curve, other than the point at infinity.
+def validate_public_key(curve, n, Q):
+    if Q.is_infinite():
+        return False
+    key = (curve.params(), n, Q.x, Q.y)
+    if pubkey_cache.get(key):
+        return True
+    if not curve.contains(Q) or not curve.mult(Q, n).is_infinite():
+        return False
+    pubkey_cache.put(key, True)
+    return True
+
+#ECDSA functions ---------------------------------------------------------------------------------
+
+#Messages read from files are fed to sha256 in chunks of this many bytes.
+hash_chunk_size = 1 << 20
+
+#Use sha256 to hash a message, and return the hash value as an integer. The message can be a
+#string (hashed as utf-8), bytes or any other buffer, or a file object or mmap, which is read in
+#chunks from its current position so that large files are hashed in constant memory. A hash
+#object that has already been fed the message is used as is, and an integer is taken to be a
+#precomputed hash value. Bytes are always hashed, even if they happen to be a digest, unless
+#prehashed is set, in which case message must be the digest itself (e.g. sha256(m).digest()).
+def hash(message, prehashed=False):
+    if prehashed:
+        if isinstance(message, int):
+            return message
+        if not isinstance(message, (bytes, bytearray, memoryview)):
+            raise TypeError('a prehashed message must be the digest as bytes or an integer')
+        return int.from_bytes(message, 'big')
+    if isinstance(message, int):
+        return message
+    if isinstance(message, str):
+        message = message.encode('utf-8')
+    if hasattr(message, 'digest'):
+        return int.from_bytes(message.digest(), 'big')
+    if hasattr(message, 'read'):
+        h = sha256()
+        chunk = message.read(hash_chunk_size)
+        while chunk:
+            h.update(chunk)
+            chunk = message.read(hash_chunk_size)
+        return int.from_bytes(h.digest(), 'big')
+    return int.from_bytes(sha256(message).digest(), 'big')
+
+#Hash the message and return integer whose binary representation is the the L leftmost bits
+#of the hash value, where L is the bit length of n.
+def hash_and_truncate(message, n, prehashed=False):
+    h = hash(message, prehashed)
+    return h >> max(0, h.bit_length() - n.bit_length())
+
+#Generate a keypair using the point P of order n on the given curve. The private key is a
+#positive integer d smaller than n, and the public key is Q = dP.
+def generate_keypair(curve, P, n):
+    sysrand = SystemRandom()
+    d = sysrand.randrange(1, n)
+    Q = fixed_base_mult(curve, P, d, n.bit_length())
+    logger.info('Priv key: d = %s', d)
+    logger.info('Publ key: Q = %s', Q)
+    return (d, Q)
+
+#Create a digital signature for the message (anything hash accepts, or a digest with prehashed
+#set) using a given curve with a distinguished point P which generates a prime order subgroup of
+#size n.
+def sign(message, curve, P, n, keypair, prehashed=False):
+    #Extract the private and public keys, and compute z by hashing the message.
+    d, Q = keypair
+    z = hash_and_truncate(message, n, prehashed)
+    #Choose a randomly selected secret point kP then compute r and s.
+    r, s = 0, 0
+    while r == 0 or s == 0:
+        sysrand = SystemRandom()
+        k = sysrand.randrange(1, n)
+        R = fixed_base_mult(curve, P, k, n.bit_length())
+        #Replace k by -k if necessary, so that R has an even y coordinate. This leaves r
+        #unchanged, and lets verify_batch recover R from r.
+        if R.y % 2 == 1:
+            k, R = n - k, curve.invert(R)
+        r = R.x % n
+        s = (mult_inv(k, n) * (z + r*d)) % n
+    logger.info('ECDSA sig: (Q, r, s) = (%s, %s, %s)', Q, r, s)
+    return (Q, r, s)
+
+#Verify the message (anything hash accepts, or a digest with prehashed set) is authentic, given
+#an ECDSA signature generated using a curve with a distinguished point P that generates a prime
+#order subgroup of size n.
+def verify(message, curve, P, n, sig, prehashed=False):
+    Q, r, s = sig
+    #Confirm that Q is on the curve, and has order that divides n.
+    if not validate_public_key(curve, n, Q):
+        return False
+    #Confirm that r and s are at least in the acceptable range, 0 < r, s < n. In particular s must
+    #be invertible mod n.
+    if not 0 < r < n or not 0 < s < n:
+        return False
+    #Compute z in the same manner used in the signing procedure, and look for a cached result.
+    z = hash_and_truncate(message, n, prehashed)
+    if verify_cache.maxsize > 0:
+        key = (curve.params(), P.x, P.y, n, Q.x, Q.y, z, r, s)
+        result = verify_cache.get(key)
+        if result is not None:
+            return result
+    #Verify the message is authentic.
+    w = mult_inv(s, n) % n
+    u_1, u_2 = z * w % n, r * w % n
+    C = curve.multi_mult([(P, u_1), (Q, u_2)])
+    result = r % n == C.x % n
+    if verify_cache.maxsize > 0:
+        verify_cache.put(key, result)
+    return result
+
+#Verify many messages at once. The items are (message, sig) pairs, read lazily from any iterable
+#in chunks of chunk_size, and the result is a list of booleans in the same order. If processes is
+#given, chunks are checked in parallel by that many worker processes. With prehashed set, every
+#message is a digest, as in verify.
+def verify_batch(curve, P, n, items, randomized=False, processes=None, chunk_size=64,
+                 prehashed=False):
+    items = iter(items)
+    chunks = iter(lambda: list(islice(items, chunk_size)), [])
+    results = []
+    if processes is None:
+        for chunk in chunks:
+            results.extend(_verify_chunk((curve, P, n, chunk, randomized, prehashed)))
+    else:
+        #Keep only a few chunks in flight, so that a long stream of items isn't read into
+        #memory all at once.
+        with ProcessPoolExecutor(processes) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_verify_chunk,
+                                           (curve, P, n, chunk, randomized, prehashed)))
+                if len(pending) >= 2*processes:
+                    results.extend(pending.popleft().result())
+            while pending:
+                results.extend(pending.popleft().result())
+    return results
+
+#Verify one chunk of (message, sig) pairs for verify_batch.
+def _verify_chunk(args):
+    curve, P, n, chunk, randomized, prehashed = args
+    #Randomized checks need every point R = kP to be recoverable from r, which is only safe
+    #when the whole group is the prime order subgroup generated by P. By Hasse's theorem, the
+    #group has at most p + 1 + 2sqrt(p) points, so this holds when n is more than half that.
+    if not randomized or curve.exp != 1 or 2*n <= curve.char + 1 + 2*(isqrt(curve.char) + 1):
+        return [verify(message, curve, P, n, sig, prehashed) for message, sig in chunk]
+    results = [False]*len(chunk)
+    batch = []
+    for i, (message, (Q, r, s)) in enumerate(chunk):
+        if not 0 < r < n or not 0 < s < n:
+            continue
+        #When r + n < p, R could have x coordinate r or r + n, so check the signature alone.
+        if r + n < curve.char:
+            results[i] = verify(message, curve, P, n, (Q, r, s), prehashed)
+            continue
+        if not validate_public_key(curve, n, Q):
+            continue
+        R = curve.lift_x(r)
+        if R is None:
+            continue
+        w = mult_inv(s, n)
+        batch.append((i, hash_and_truncate(message, n, prehashed) * w % n, r * w % n, Q, R))
+    for i, valid in zip([i for i, u_1, u_2, Q, R in batch], _verify_group(curve, P, n, batch)):
+        results[i] = valid
+    return results
+
+#Check a group of signatures, given as (i, u_1, u_2, Q, R). Each one is valid when u_1P + u_2Q = R
+#(where sign chooses R with even y), so for random c_i, the sum of c_i(u_1P + u_2Q - R) over the
+#group is infinity when all of them are valid, and almost certainly isn't otherwise. That's one
+#multi-scalar multiplication for the whole group. If it fails, split the group in two and check
+#each half, until the invalid signatures are isolated.
+def _verify_group(curve, P, n, group):
+    if len(group) == 1:
+        #A single signature is also valid when u_1P + u_2Q = -R.
+        i, u_1, u_2, Q, R = group[0]
+        C = curve.multi_mult([(P, u_1), (Q, u_2)])
+        return [not C.is_infinite() and C.x == R.x]
+    elif len(group) == 0:
+        return []
+    sysrand = SystemRandom()
+    u = 0
+    pairs = []
+    for i, u_1, u_2, Q, R in group:
+        c = sysrand.randrange(1, min(n, 2**128))
+        u = (u + c*u_1) % n
+        pairs.append((Q, c*u_2 % n))
+        pairs.append((R, -c % n))
+    if curve.multi_mult([(P, u)] + pairs).is_infinite():
+        return [True]*len(group)
+    else:
+        half = len(group) // 2
+        return _verify_group(curve, P, n, group[:half]) + _verify_group(curve, P, n, group[half:])
+
+#Public Key Files --------------------------------------------------------------------------------
+
+#Write public keys (points) to a binary file, given as a filename or a file opened for binary
+#writing, as their SEC1 encodings one after another. Compressed keys take 33 bytes each on
+#secp256k1. Returns the number of keys written.
+def write_public_keys(curve, keys, f, compressed=True):
+    if isinstance(f, str):
+        with open(f, 'wb') as f:
+            return write_public_keys(curve, keys, f, compressed)
+    count, chunk = 0, []
+    for Q in keys:
+        chunk.append(curve.encode_point(Q, compressed))
+        count += 1
+        if len(chunk) == 4096:
+            f.write(b''.join(chunk))
+            chunk = []
+    f.write(b''.join(chunk))
+    return count
+
+#Read the public keys written by write_public_keys, one at a time. The file is read
+#hash_chunk_size bytes at a time, and compressed and uncompressed keys may be mixed. Raises
+#ValueError on an invalid encoding, or if the file ends partway through a key.
+def read_public_keys(curve, f):
+    if isinstance(f, str):
+        with open(f, 'rb') as f:
+            yield from read_public_keys(curve, f)
+        return
+    buf = b''
+    while True:
+        data = f.read(hash_chunk_size)
+        buf += data
+        pos = 0
+        while pos < len(buf):
+            size = curve.encoded_size(buf[pos])
+            if pos + size > len(buf):
+                break
+            yield curve.decode_point(buf[pos:pos + size])
+            pos += size
+        buf = buf[pos:]
+        if not data:
+            if buf:
+                raise ValueError('file ends partway through a public key')
+            return
+
+#Signing with Precomputed Nonces -----------------------------------------------------------------
+
+#Live nonce pools, so each one can be reset in the child after a fork.
+nonce_pools = weakref.WeakSet()
+
+class NoncePool(object):
+    #Keep a pool of precomputed pairs (k^-1 mod n, r) for signing with the point P of order n,
+    #where r is the x coordinate of kP mod n. A background thread tops the pool back up to size
+    #pairs whenever it drops to low_water. If the pool is ever empty, take computes a pair on the
+    #spot and counts the exhaustion. Each pair comes from a fresh random k and is removed from the
+    #pool when taken, so no nonce is ever used twice. Call close (or use the Signer in a with
+    #block) when done. The thread only holds a weak reference to the pool, so a pool that is
+    #simply dropped is still garbage collected, and its thread exits within a second.
+    def __init__(self, curve, P, n, size=64, low_water=16):
+        self.curve, self.P, self.n = curve, P, n
+        self.size, self.low_water = size, low_water
+        self.produced, self.taken, self.exhausted = 0, 0, 0
+        self.closed = False
+        self.reset()
+        nonce_pools.add(self)
+
+    #Create the lock and the (empty) pool, and start the refill thread.
+    def reset(self):
+        self.pairs = deque()
+        self.lock = threading.Lock()
+        self.wanted = threading.Condition(self.lock)
+        self.thread = threading.Thread(target=NoncePool.refill,
+                                       args=(weakref.ref(self), self.wanted), daemon=True)
+        self.thread.start()
+
+    #A forked child inherits a copy of the pool, whose pairs its parent may also use, and whose
+    #lock may have been held by the refill thread at the moment of the fork (threads don't
+    #survive a fork). So the child starts over with a new lock, an empty pool and its own thread.
+    def after_fork(self):
+        if not self.closed:
+            self.reset()
+
+    #Compute one pair, choosing k (as sign does) so that kP has an even y coordinate.
+    def make_pair(self):
+        sysrand = SystemRandom()
+        r = 0
+        while r == 0:
+            k = sysrand.randrange(1, self.n)
+            R = fixed_base_mult(self.curve, self.P, k, self.n.bit_length())
+            if R.y % 2 == 1:
+                k, R = self.n - k, self.curve.invert(R)
+            r = R.x % self.n
+        return (mult_inv(k, self.n), r)
+
+    #Body of the refill thread. Sleep until the pool runs low, then fill it back up. Between
+    #refills the thread holds only a weak reference to the pool, and it exits once the pool is
+    #closed or collected.
+    @staticmethod
+    def refill(ref, wanted):
+        while True:
+            with wanted:
+                pool = ref()
+                if pool is None or pool.closed:
+                    return
+                if len(pool.pairs) > pool.low_water:
+                    pool = None
+                    wanted.wait(1.0)
+                    continue
+            while len(pool.pairs) < pool.size and not pool.closed:
+                pair = pool.make_pair()
+                with pool.lock:
+                    pool.pairs.append(pair)
+                    pool.produced += 1
+            pool = None
+
+    #Remove a pair from the pool and return it.
+    def take(self):
+        with self.wanted:
+            pair = self.pairs.popleft() if self.pairs else None
+            self.taken += 1
+            if pair is None:
+                self.exhausted += 1
+            if len(self.pairs) <= self.low_water:
+                self.wanted.notify()
+        return pair if pair is not None else self.make_pair()
+
+    #Stop the refill thread and discard the remaining pairs.
+    def close(self):
+        with self.wanted:
+            self.closed = True
+            self.pairs.clear()
+            self.wanted.notify()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def stats(self):
+        return {'available': len(self.pairs), 'size': self.size, 'low_water': self.low_water,
+                'produced': self.produced, 'taken': self.taken, 'exhausted': self.exhausted}
+
+def _reset_nonce_pools():
+    for pool in list(nonce_pools):
+        pool.after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_nonce_pools)
+
+class Signer(object):
+    #Sign messages with a given keypair, using the point P of order n on the curve. The expensive
+    #part of sign, computing kP and inverting k, happens ahead of time in a NoncePool, so signing
+    #costs a hash and a few multiplications mod n.
+    def __init__(self, curve, P, n, keypair, size=64, low_water=16):
+        self.curve, self.P, self.n = curve, P, n
+        self.keypair = keypair
+        self.pool = NoncePool(curve, P, n, size, low_water)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    #Create a signature (Q, r, s) exactly as sign would, but without printing it.
+    def sign(self, message, prehashed=False):
+        d, Q = self.keypair
+        z = hash_and_truncate(message, self.n, prehashed)
+        s = 0
+        while s == 0:
+            k_inv, r = self.pool.take()
+            s = k_inv * (z + r*d) % self.n
+        return (Q, r, s)
+
+    def close(self):
+        self.pool.close()
+
+#Key Cracking Functions --------------------------------------------------------------------------
+
+#What a key cracking function returns: the private key d (None if it wasn't found), the time
+#taken in seconds, and the operations performed on the curve, as counted by Curve.instrument.
+class CrackResult(object):
+    def __init__(self, key, elapsed, counts):
+        self.key, self.elapsed, self.counts = key, elapsed, counts
+
+    def __repr__(self):
+        return ('CrackResult(key=' + str(self.key) + ', elapsed=' + str(round(self.elapsed, 3)) +
+                ', counts=' + str(self.counts) + ')')
+
+#Time a with block and count the operations it performs on the curve, instrumenting the curve
+#for the duration if it isn't already. Work done in other processes isn't counted.
+class Tally(object):
+    def __init__(self, curve):
+        self.curve = curve
+
+    def __enter__(self):
+        self.instrumented = self.curve.counts is not None
+        if not self.instrumented:
+            self.curve.instrument()
+        self.before = dict(self.curve.counts)
+        self.start_time = time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time() - self.start_time
+        self.counts = dict((key, count - self.before[key]) for key, count in self.curve.counts.items())
+        if not self.instrumented:
+            self.curve.uninstrument()
+
+    #Report the outcome, and wrap it up in a CrackResult.
+    def result(self, d, failure="Q is not a multiple of P"):
+        if d is not None:
+            logger.info('Priv key: d = %s', d)
+        else:
+            logger.info(failure)
+        logger.info('Time: %s secs', round(self.elapsed, 3))
+        return CrackResult(d, self.elapsed, self.counts)
+
+#Find d for which Q = dP by simply trying all possibilities
+def crack_brute_force(curve, P, n, Q):
+    with Tally(curve) as tally:
+        key = None
+        for d in range(n):
+            if curve.mult(P,d) == Q:
+                key = d
+                break
+    return tally.result(key)
+
+class BabyGiant(object):
+    #Prepare to solve Q = dP with the baby-step giant-step algorithm, where P has order n. The
+    #baby steps bP for 0 <= b <= m go in a hash table keyed by x coordinate. Since bP and -bP share
+    #an x coordinate, a match identifies d up to a multiple of the giant step 2m + 1. By default
+    #m is about sqrt(n/2). Setting max_table caps m, which means more giant steps instead.
+    def __init__(self, curve, P, n, max_table=None):
+        self.curve, self.P, self.n = curve, P, n
+        m = isqrt(n // 2) + 1
+        if max_table is not None:
+            m = max(1, min(m, max_table))
+        #The dictionary value stores b so it can be recovered after a matching giant step. Each
+        #baby step is one addition of P to the previous one.
+        self.table = {}
+        for b, bP in enumerate(curve.progression(Point.atInfinity(), P, m + 1)):
+            if not bP.is_infinite():
+                self.table.setdefault(bP.x, b)
+        self.stride = 2*m + 1
+
+    #Find d with Q = dP, or return None if there isn't one.
+    def solve(self, Q):
+        curve, P, n = self.curve, self.P, self.n
+        #Check if Q - gsP matches a baby step for each g, where s is the stride. If it has the
+        #same x coordinate as bP, then Q - gsP = bP or -bP, so d = gs + b or d = gs - b.
+        step = curve.invert(curve.mult(P, self.stride))
+        for g, R in enumerate(curve.progression(Q, step, n // self.stride + 2)):
+            if R.is_infinite():
+                return g*self.stride % n
+            b = self.table.get(R.x)
+            if b is not None:
+                bP = curve.mult(P, b)
+                if R == bP:
+                    return (g*self.stride + b) % n
+                elif R == curve.invert(bP):
+                    return (g*self.stride - b) % n
+        return None
+
+#Find d for which Q = dP using the baby-step giant-step algortihm.
+def crack_baby_giant(curve, P, n, Q, max_table=None):
+    with Tally(curve) as tally:
+        d = BabyGiant(curve, P, n, max_table).solve(Q)
+    return tally.result(d)
+
+#Find d for which Q = dP using Pollard's rho algorithm. Assumes subgroup has prime order n.
+def crack_rho(curve, P, n, Q, bits):
+    with Tally(curve) as tally:
+        d = rho(curve, P, n, Q, bits)
+    return tally.result(d, "Rho failed with identical linear combinations")
+
+#The computation behind crack_rho, which returns d (or None on failure) without printing.
+def rho(curve, P, n, Q, bits):
+    R_list = []
+    #Compute 2^bits randomly selected linear combinations of P and Q, storing them as triples
+    #of the form (aP + bQ, a, b) in R_list.
+    for i in range(2**bits):
+        a, b = randrange(0,n), randrange(0,n)
+        R_list.append((curve.multi_mult([(P,a), (Q,b)]), a, b))
+    #Compute a new random linear combination of P and Q to start the cycle-finding.
+    aT, bT = randrange(0,n), randrange(0,n)
+    aH, bH = aT, bT
+    T = curve.multi_mult([(P,aT), (Q,bT)])
+    H = T
+    mask = 2**bits - 1
+    while True:
+        #Advance the tortoise one step, by adding a point in R_list determined by the last b
+        #bits in the binary explansion of the x coordinate of the current position.
+        j = T.x & mask
+        T, aT, bT = curve.add(T, R_list[j][0]), (aT + R_list[j][1]) % n, (bT + R_list[j][2]) % n
+        #Advance the hare two steps, again by adding points in R_list determined by the last
+        #b bits in the binary explansion of the x coordinate of the current position.
+        for i in range(2):
+            j = H.x & mask
+            H, aH, bH = curve.add(H, R_list[j][0]), (aH + R_list[j][1]) % n, (bH + R_list[j][2]) % n
+        #If the tortoise and hare arrive at the same point, a cycle has been found.
+        if(T == H):
+            break
+    #It is possible that the tortoise and hare arrive at exactly the same linear combination.
+    if bH == bT:
+        return None
+    else:
+        return (aT - aH) * mult_inv((bH - bT) % n, n) % n
+
+#Find d for which Q = dP using van Oorschot and Wiener's parallel version of Pollard's rho. Many
+#walks using the same iterating function as crack_rho run at once, spread over the given number of
+#worker processes (or run here if processes is None). A point is distinguished when the last
+#dp_bits bits of its x coordinate are zero. Each walk runs until it hits a distinguished point,
+#which is reported to a shared table, and then restarts at a new random linear combination. Two
+#walks that collide anywhere reach the same distinguished point, so two linear combinations stored
+#under the same point give d. Assumes subgroup has prime order n.
+#
+#With negation set, each step replaces the point by whichever of T and -T has the smaller y
+#coordinate, so walks run on pairs {T, -T}. That halves the size of the space being searched.
+#If checkpoint names a file, the state of all walks and the table are saved there after every
+#round of steps_per_round steps per walk, and a later call with the same file resumes from it.
+#
+#If Q is not a multiple of P, no collision ever gives a key that checks out, so the search gives
+#up (and returns no key) after max_steps steps in total. The default of 16 sqrt(n) steps, plus
+#enough for every walk to reach a few distinguished points, makes giving up on a Q that is a
+#multiple of P vanishingly unlikely.
+def crack_rho_parallel(curve, P, n, Q, bits=4, walks=8, processes=None, dp_bits=None,
+                       negation=False, checkpoint=None, steps_per_round=1000, max_steps=None):
+    with Tally(curve) as tally:
+        d = rho_parallel(curve, P, n, Q, bits, walks, processes, dp_bits, negation, checkpoint,
+                         steps_per_round, max_steps)
+    return tally.result(d)
+
+#The parallel rho computation behind crack_rho_parallel, which returns d (or None if it gives
+#up) without printing.
+def rho_parallel(curve, P, n, Q, bits=4, walks=8, processes=None, dp_bits=None, negation=False,
+                 checkpoint=None, steps_per_round=1000, max_steps=None):
+    if dp_bits is None:
+        dp_bits = max(0, n.bit_length() // 4 - 1)
+    if max_steps is None:
+        max_steps = 16*isqrt(n) + 40*walks*2**dp_bits
+    if checkpoint is not None and os.path.exists(checkpoint):
+        R_list, states, table = _rho_load(checkpoint, curve, P, n, Q, bits, dp_bits, negation)
+    else:
+        sysrand = SystemRandom()
+        R_list = []
+        for i in range(2**bits):
+            a, b = sysrand.randrange(n), sysrand.randrange(n)
+            R_list.append((curve.multi_mult([(P,a), (Q,b)]), a, b))
+        states = [None]*walks
+        table = {}
+    groups = max(1, processes or 1)
+    pool = ProcessPoolExecutor(processes) if processes is not None else None
+    d, steps = None, 0
+    try:
+        while d is None and steps < max_steps:
+            #Hand each group of walks to a worker, and collect the distinguished points found.
+            tasks = [(curve, P, n, Q, R_list, dp_bits, negation, states[i::groups], steps_per_round)
+                     for i in range(groups)]
+            results = pool.map(_rho_walks, tasks) if pool is not None else map(_rho_walks, tasks)
+            new_states = [None]*len(states)
+            for i, (group_states, found) in enumerate(results):
+                new_states[i::groups] = group_states
+                for T, a, b in found:
+                    d = d if d is not None else _rho_collide(curve, P, n, Q, table, T, a, b)
+            states = new_states
+            steps += walks*steps_per_round
+            if checkpoint is not None:
+                _rho_save(checkpoint, curve, P, n, Q, bits, dp_bits, negation, R_list, states, table)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return d
+
+#Put the distinguished point T = aP + bQ in the table, and return d if it collides with a
+#different linear combination already there.
+def _rho_collide(curve, P, n, Q, table, T, a, b):
+    #A walk that lands on the point at infinity has aP + bQ = 0 on its own.
+    if T.is_infinite():
+        candidates = [(-a, b)]
+    elif T.x not in table:
+        table[T.x] = (T.y, a, b)
+        return None
+    else:
+        #The stored point is either T or -T. From aP + bQ = +/-(a'P + b'Q), d(b -/+ b') = a' -/+ a.
+        y, a_2, b_2 = table[T.x]
+        if y == T.y:
+            candidates = [(a_2 - a, b - b_2)]
+        else:
+            candidates = [(-a_2 - a, b + b_2)]
+    for num, den in candidates:
+        if den % n != 0:
+            d = num * mult_inv(den % n, n) % n
+            if curve.mult(P, d) == Q:
+                return d
+    return None
+
+#Advance a group of rho walks for crack_rho_parallel, where each walk is a tuple (T, a, b, length)
+#with T = aP + bQ, or None for a walk that hasn't started. Returns the new walks, along with any
+#distinguished points (T, a, b) they hit.
+def _rho_walks(args):
+    curve, P, n, Q, R_list, dp_bits, negation, states, steps = args
+    sysrand = SystemRandom()
+    mask, dp_mask = len(R_list) - 1, 2**dp_bits - 1
+    #Walks that wander for much longer than expected without a distinguished point are probably
+    #stuck in a cycle, so they're abandoned.
+    max_length = 20 * 2**dp_bits
+    found = []
+    for i, state in enumerate(states):
+        T, a, b, length = state if state is not None else (None, 0, 0, 0)
+        recent = deque(maxlen=3)
+        for step in range(steps):
+            if T is None or length > max_length:
+                a, b = sysrand.randrange(n), sysrand.randrange(n)
+                T, length = curve.multi_mult([(P,a), (Q,b)]), 0
+                recent.clear()
+                if negation:
+                    T, a, b = _rho_canonical(curve, n, T, a, b)
+            if T.is_infinite() or T.x & dp_mask == 0:
+                found.append((T, a, b))
+                T = None
+                continue
+            R, a_R, b_R = R_list[T.x & mask]
+            U, a_U, b_U = curve.add(T, R), (a + a_R) % n, (b + b_R) % n
+            if negation:
+                U, a_U, b_U = _rho_canonical(curve, n, U, a_U, b_U)
+                #With the negation map, a walk can fall into a fruitless cycle, of length 2
+                #(T -> U -> T) or, less often, 4. Escape it deterministically, by doubling the
+                #point of the cycle with the smallest x, so walks that meet in it leave together.
+                cycle = None
+                if recent and U == recent[-1][0]:
+                    cycle = [recent[-1], (T, a, b)]
+                elif len(recent) == 3 and U == recent[0][0]:
+                    cycle = list(recent) + [(T, a, b)]
+                if cycle is not None and not U.is_infinite():
+                    T, a, b = min(cycle, key=lambda C: C[0].x)
+                    U, a_U, b_U = _rho_canonical(curve, n, curve.double(T), 2*a % n, 2*b % n)
+            recent.append((T, a, b))
+            T, a, b, length = U, a_U, b_U, length + 1
+        states[i] = (T, a, b, length) if T is not None else None
+    return states, found
+
+#Of the points T = aP + bQ and -T = -aP - bQ, return the one with the smaller y coordinate.
+def _rho_canonical(curve, n, T, a, b):
+    if not T.is_infinite() and T.y > curve.char - T.y:
+        return (curve.invert(T), -a % n, -b % n)
+    else:
+        return (T, a, b)
+
+#Save the state of crack_rho_parallel as JSON.
+def _rho_save(filename, curve, P, n, Q, bits, dp_bits, negation, R_list, states, table):
+    def point(T):
+        return None if T.is_infinite() else [T.x, T.y]
+    data = {'curve': list(curve.params()), 'P': point(P), 'n': n, 'Q': point(Q), 'bits': bits,
+            'dp_bits': dp_bits, 'negation': negation,
+            'R_list': [[point(R), a, b] for R, a, b in R_list],
+            'states': [None if S is None else [point(S[0]), S[1], S[2], S[3]] for S in states],
+            'table': [[x, y, a, b] for x, (y, a, b) in table.items()]}
+    #Write to a temporary file first, so an interrupted save can't clobber the last checkpoint.
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(filename + '.tmp', filename)
+
+#Load the state of crack_rho_parallel saved by _rho_save, checking it belongs to the same problem.
+def _rho_load(filename, curve, P, n, Q, bits, dp_bits, negation):
+    def point(T):
+        return Point.atInfinity() if T is None else Point(*T)
+    with open(filename) as f:
+        data = json.load(f)
+    if (tuple(data['curve']) != curve.params() or point(data['P']) != P or data['n'] != n
+            or point(data['Q']) != Q or data['bits'] != bits or data['dp_bits'] != dp_bits
+            or data['negation'] != negation):
+        raise ValueError('checkpoint belongs to a different rho computation')
+    R_list = [(point(R), a, b) for R, a, b in data['R_list']]
+    states = [None if S is None else (point(S[0]), S[1], S[2], S[3]) for S in data['states']]
+    table = dict((x, (y, a, b)) for x, y, a, b in data['table'])
+    return R_list, states, table
+
+#Find d for which Q = dP using the Pohlig-Hellman algorithm, where P has order n. If n = p_1^e_1 *
+#... * p_k^e_k, then d mod p_i^e_i is a discrete log in the subgroup of order p_i^e_i, which can be
+#found one base p_i digit at a time by solving discrete logs in the subgroup of order p_i. The
+#Chinese remainder theorem puts these together to give d mod n. The work depends on the largest
+#prime factor of n rather than on n itself. Large prime factors are solved with parallel rho,
+#which gives up after max_steps steps (see crack_rho_parallel).
+def crack_pohlig_hellman(curve, P, n, Q, max_steps=None):
+    with Tally(curve) as tally:
+        d = pohlig_hellman(curve, P, n, Q, max_steps)
+    return tally.result(d)
+
+#The computation behind crack_pohlig_hellman, which returns d (or None if Q is not a multiple of
+#P) without printing.
+def pohlig_hellman(curve, P, n, Q, max_steps=None):
+    residues, moduli = [], []
+    for p, e in sorted(factor(n).items()):
+        #P_0 generates the subgroup of order p. Small subgroups are solved with baby-step
+        #giant-step, sharing one table between all the digits, and large ones with rho.
+        P_0 = curve.mult(P, n // p)
+        engine = BabyGiant(curve, P_0, p) if p.bit_length() <= 36 else None
+        x = 0
+        for j in range(e):
+            #If d = x + d_j*p^j + (higher digits) mod p^e, multiplying Q - xP by n/p^(j+1) kills
+            #the higher digits, leaving d_j*P_0.
+            Q_j = curve.mult(curve.add(Q, curve.invert(curve.mult(P, x))), n // p**(j+1))
+            if engine is not None:
+                d_j = engine.solve(Q_j)
+            elif Q_j.is_infinite():
+                d_j = 0
+            else:
+                d_j = rho_parallel(curve, P_0, p, Q_j, negation=True, max_steps=max_steps)
+            if d_j is None:
+                return None
+            x += d_j * p**j
+        residues.append(x)
+        moduli.append(p**e)
+    d, m = crt(residues, moduli)
+    #Every digit can check out even when Q isn't a multiple of P, if Q has a component outside
+    #the group generated by P. So check the answer as a whole.
+    return d if curve.mult(P, d) == Q else None
+
+#Find d from two messages signed with the same nonce k. Assumes subgroup has prime order n.
+def crack_from_ECDSA_repeat_k(curve, P, n, m1, sig1, m2, sig2):
+    Q1, r1, s1 = sig1
+    Q2, r2, s2 = sig2
+    with Tally(curve) as tally:
+        d = None
+        #Messages signed with the same k have the same r. Any key found is checked against Q1, so
+        #a coincidental match of r between distinct k gives no key rather than a wrong one.
+        if r1 == r2:
+            z1 = hash_and_truncate(m1, n)
+            z2 = hash_and_truncate(m2, n)
+            d = key_from_repeat_k(curve, P, n, Q1, r1, z1, s1, z2, s2)
+    return tally.result(d, "Messages signed with distinct k")
+
+#Recover the private key d of Q from signatures (r, s1) and (r, s2) of the truncated hashes z1 and
+#z2, made with the same nonce k. Since s_i = k^-1(z_i + rd), k = (z1 - z2)/(s1 - s2) and then
+#d = (s1*k - z1)/r. A signature (r, -s) verifies as well as (r, s), so the second one may have
+#been made with -k, which the same formula handles with -s2 in place of s2. Both are tried, and d
+#is only returned if dP = Q. Returns None otherwise.
+def key_from_repeat_k(curve, P, n, Q, r, z1, s1, z2, s2):
+    if r % n == 0:
+        return None
+    for t in (s2, -s2):
+        if (s1 - t) % n == 0:
+            continue
+        k = (z1 - z2) * mult_inv((s1 - t) % n, n) % n
+        d = mult_inv(r, n) * ((s1 * k) % n - z1) % n
+        if curve.mult(P, d) == Q:
+            return d
+    return None
+
+#Scanning for Repeated Nonces ---------------------------------------------------------------------
+
+#A private key d recovered by NonceScanner, with the public key Q and the r shared by the two
+#signatures it came from, which are numbered by their position in the scanned stream.
+class RepeatedNonce(object):
+    def __init__(self, Q, r, d, first, second):
+        self.Q, self.r, self.d = Q, r, d
+        self.first, self.second = first, second
+
+    def __repr__(self):
+        return ('RepeatedNonce(Q=' + str(self.Q) + ', r=' + str(self.r) + ', d=' + str(self.d) +
+                ', first=' + str(self.first) + ', second=' + str(self.second) + ')')
+
+#Read signature records (digest, Q, r, s) from a text file, given as a filename or an open file.
+#Each line holds the message digest, the coordinates x and y of Q, r and s as hexadecimal
+#integers separated by whitespace or commas. Blank lines and lines starting with # are skipped.
+#The digest is returned as an integer, which hash_and_truncate uses as it is.
+def read_signatures(f):
+    if isinstance(f, str):
+        with open(f) as f:
+            yield from read_signatures(f)
+        return
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        z, x, y, r, s = [int(v, 16) for v in line.replace(',', ' ').split()]
+        yield (z, Point(x, y), r, s)
+
+class NonceScanner(object):
+    #Scan a stream of signatures (message, Q, r, s), made with the point P of order n, for pairs
+    #sharing both Q and r. Such a pair was made with a repeated nonce and gives away the private
+    #key of Q. The first signature seen for each (Q, r) is kept in an index, as its position in
+    #the stream, truncated hash and s. At most max_entries of these are held in memory. If spill
+    #is a filename, a full index is moved to a dbm database there, and lookups check both.
+    #Otherwise the oldest entries are dropped to make room, and a repeat of a dropped signature
+    #is missed (evicted counts the drops). Once the key of Q is recovered, the rest of its
+    #signatures are skipped. Progress is logged every report_every signatures.
+    def __init__(self, curve, P, n, max_entries=10**6, spill=None, report_every=10**5):
+        self.curve, self.P, self.n = curve, P, n
+        self.max_entries, self.report_every = max_entries, report_every
+        self.index = OrderedDict()
+        self.disk = dbm.open(spill, 'n') if spill is not None else None
+        self.keys = {}
+        self.records, self.repeats, self.failed = 0, 0, 0
+        self.spilled, self.evicted = 0, 0
+        self.elapsed, self.started = 0.0, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    #Index entries are strings, so the same ones can go in the dictionary and the database.
+    def lookup(self, key):
+        value = self.index.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            value = value.decode() if value is not None else None
+        return None if value is None else [int(v, 16) for v in value.split(':')]
+
+    def store(self, key, i, z, s):
+        if len(self.index) >= self.max_entries:
+            if self.disk is not None:
+                for k, v in self.index.items():
+                    self.disk[k] = v
+                self.spilled += len(self.index)
+                self.index.clear()
+            else:
+                self.index.popitem(last=False)
+                self.evicted += 1
+        self.index[key] = '%x:%x:%x' % (i, z, s)
+
+    #Scan records, given as an iterable of (message, Q, r, s), or as a file or filename to read
+    #with read_signatures, and yield a RepeatedNonce for each key recovered, as soon as it's found.
+    #Scanning more records later carries on with the same index.
+    def scan(self, records):
+        if isinstance(records, str) or hasattr(records, 'read'):
+            records = read_signatures(records)
+        self.started = perf_counter()
+        try:
+            for message, Q, r, s in records:
+                i = self.records
+                self.records += 1
+                if self.report_every and self.records % self.report_every == 0:
+                    self.report()
+                if Q.is_infinite() or (Q.x, Q.y) in self.keys:
+                    continue
+                z = hash_and_truncate(message, self.n)
+                key = '%x:%x:%x' % (Q.x, Q.y, r)
+                prior = self.lookup(key)
+                if prior is None:
+                    self.store(key, i, z, s)
+                    continue
+                j, z1, s1 = prior
+                self.repeats += 1
+                d = key_from_repeat_k(self.curve, self.P, self.n, Q, r, z1, s1, z, s)
+                if d is None:
+                    self.failed += 1
+                    continue
+                self.keys[(Q.x, Q.y)] = d
+                yield RepeatedNonce(Q, r, d, j, i)
+        finally:
+            self.elapsed += perf_counter() - self.started
+            self.started = None
+            self.report()
+
+    def report(self):
+        stats = self.stats()
+        logger.info("Scanned %d signatures (%.0f/sec), %d repeated nonces, %d keys recovered",
+                    stats['records'], stats['per_sec'], stats['repeats'], stats['recovered'])
+
+    def stats(self):
+        elapsed = self.elapsed
+        if self.started is not None:
+            elapsed += perf_counter() - self.started
+        return {'records': self.records, 'repeats': self.repeats, 'recovered': len(self.keys),
+                'failed': self.failed, 'in_memory': len(self.index), 'spilled': self.spilled,
+                'evicted': self.evicted, 'elapsed': elapsed,
+                'per_sec': self.records / elapsed if elapsed > 0 else 0.0}
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None